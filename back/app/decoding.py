@@ -0,0 +1,35 @@
+import os
+from typing import Optional
+
+# Profils de décodage Marian : compromis latence / qualité
+DECODING_PROFILES = {
+    "fast": {"num_beams": 1, "do_sample": False},
+    "balanced": {"num_beams": 2, "do_sample": False, "early_stopping": True},
+    "quality": {"num_beams": 4, "do_sample": False, "early_stopping": True},
+}
+
+DEFAULT_DECODING_PROFILE = os.getenv("DECODING_PROFILE", "balanced")
+
+# Longueur max générée : une bulle traduite dépasse rarement 1.5x le texte source
+MAX_LENGTH_RATIO = float(os.getenv("DECODING_MAX_LENGTH_RATIO", "1.5"))
+MAX_LENGTH_OFFSET = int(os.getenv("DECODING_MAX_LENGTH_OFFSET", "8"))
+
+
+def resolve_profile(name: Optional[str] = None) -> str:
+    profile = name or DEFAULT_DECODING_PROFILE
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"Profil de décodage inconnu: {profile} (choix: {', '.join(DECODING_PROFILES)})")
+    return profile
+
+
+def generation_kwargs(profile: Optional[str], input_length: int) -> dict:
+    """Paramètres de generate() pour un profil et une longueur d'entrée en tokens.
+
+    generate() n'encode la source qu'une fois puis réutilise les sorties de
+    l'encodeur pour tous les beams ; use_cache garde en plus le cache clé/valeur
+    du décodeur entre les pas de génération.
+    """
+    kwargs = dict(DECODING_PROFILES[resolve_profile(profile)])
+    kwargs["max_new_tokens"] = int(input_length * MAX_LENGTH_RATIO) + MAX_LENGTH_OFFSET
+    kwargs["use_cache"] = True
+    return kwargs
@@ -0,0 +1,174 @@
+"""Diffusion des événements de progression (pages et batches).
+
+Deux implémentations, choisies par la variable EVENT_BROKER :
+
+- "memory" (défaut) : publication en mémoire, valable pour un seul processus.
+- "changestream" : les événements sont lus depuis les change streams MongoDB
+  sur `pages` et `batches`. Chaque réplica de l'API reçoit ainsi la progression
+  de toutes les pages, quel que soit le processus qui les a traitées.
+  Nécessite un Mongo en replica set, un seul nœud suffit en local :
+      mongod --replSet rs0   puis   rs.initiate()
+"""
+import asyncio
+import logging
+import os
+from typing import Optional, Set
+
+logger = logging.getLogger("uvicorn.error")
+
+EVENT_BROKER = os.getenv("EVENT_BROKER", "memory")
+# Taille max de la file d'un abonné lent avant de perdre des événements
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "1000"))
+
+
+def page_event(page_id: str, batch_id: str, filename: str, status: str, error_message: Optional[str] = None) -> dict:
+    return {"type": "page", "page_id": page_id, "batch_id": batch_id,
+            "filename": filename, "status": status, "error_message": error_message}
+
+
+def batch_event(batch_id: str, status: str) -> dict:
+    return {"type": "batch", "batch_id": batch_id, "status": status}
+
+
+def format_event(event: dict) -> str:
+    """Message texte envoyé sur /ws (format historique du front)"""
+    if event["type"] == "batch":
+        return f"Batch {event['batch_id']} is {event['status']}"
+    if event["status"] == "error":
+        return f"Page {event['filename']} failed: {event.get('error_message')}"
+    return f"Page {event['filename']} is {event['status']}"
+
+
+class Subscription:
+    def __init__(self, broker: "EventBroker"):
+        self.broker = broker
+        self.queue: asyncio.Queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    async def __aenter__(self):
+        self.broker._subscribers.add(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.broker._subscribers.discard(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.queue.get()
+
+
+class EventBroker:
+    """Base commune : distribue les événements reçus aux abonnés locaux"""
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        raise NotImplementedError
+
+    def subscribe(self) -> Subscription:
+        return Subscription(self)
+
+    def _dispatch(self, event: dict):
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                logger.warning("Abonné trop lent, événement de progression perdu")
+
+
+class InMemoryBroker(EventBroker):
+    """Publication directe aux abonnés du processus courant"""
+
+    async def publish(self, event: dict):
+        self._dispatch(event)
+
+
+class ChangeStreamBroker(EventBroker):
+    """Événements dérivés des change streams Mongo, partagés entre réplicas.
+
+    publish() ne fait rien : ce sont les écritures de statut dans `pages` et
+    `batches` qui produisent les événements, pour tous les processus à l'écoute.
+    """
+
+    PIPELINE = [
+        {"$match": {
+            "operationType": "update",
+            "ns.coll": {"$in": ["pages", "batches"]},
+            "updateDescription.updatedFields.status": {"$exists": True},
+        }},
+        # Ne pas renvoyer les images base64 de la page relue par updateLookup
+        {"$project": {
+            "ns": 1,
+            "documentKey": 1,
+            "updateDescription.updatedFields.status": 1,
+            "updateDescription.updatedFields.error_message": 1,
+            "fullDocument.batch_id": 1,
+            "fullDocument.filename": 1,
+        }},
+    ]
+
+    def __init__(self, db, retry_delay: float = 1.0):
+        super().__init__()
+        self.db = db
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def publish(self, event: dict):
+        pass
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self.db.watch(self.PIPELINE, full_document="updateLookup",
+                                         resume_after=self._resume_token) as stream:
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        event = self._to_event(change)
+                        if event:
+                            self._dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change stream interrompu, reprise dans {self.retry_delay}s: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    @staticmethod
+    def _to_event(change: dict) -> Optional[dict]:
+        fields = change["updateDescription"]["updatedFields"]
+        document_id = change["documentKey"]["_id"]
+        if change["ns"]["coll"] == "batches":
+            return batch_event(document_id, fields["status"])
+        page = change.get("fullDocument")
+        if not page:
+            # Page supprimée entre l'écriture et la relecture
+            return None
+        return page_event(document_id, page.get("batch_id"), page.get("filename"),
+                          fields["status"], fields.get("error_message"))
+
+
+def create_broker(db) -> EventBroker:
+    if EVENT_BROKER == "changestream":
+        return ChangeStreamBroker(db)
+    if EVENT_BROKER != "memory":
+        logger.warning(f"EVENT_BROKER inconnu '{EVENT_BROKER}', utilisation du broker en mémoire")
+    return InMemoryBroker()
@@ -0,0 +1,82 @@
+import base64
+import zipfile
+from pathlib import PurePosixPath
+from typing import AsyncIterator, List
+
+# Nombre de pages lues en une requête Mongo : borne la mémoire à quelques pages
+PAGES_PER_FETCH = 4
+# Taille des morceaux écrits dans l'archive (et donc envoyés au client)
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "cbz": "application/vnd.comicbook+zip",
+    "zip": "application/zip",
+}
+
+
+class _ZipSink:
+    """Flux d'écriture non seekable : zipfile écrit dedans, on vide au fil de l'eau"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_entry_name(index: int, filename: str) -> str:
+    """Nom de fichier dans l'archive : préfixe numérique pour garder l'ordre de lecture"""
+    stem = PurePosixPath(filename.replace("\\", "/")).stem or "page"
+    return f"{index:04d}_{stem}.png"
+
+
+async def stream_batch_archive(pages_collection, page_ids: List[str]) -> AsyncIterator[bytes]:
+    """Génère une archive ZIP des pages traduites, page par page, dans l'ordre de page_ids.
+
+    L'archive n'est jamais construite en mémoire : seules quelques pages sont
+    chargées à la fois et chaque morceau écrit est envoyé immédiatement.
+    Les PNG étant déjà compressés, les entrées sont stockées sans compression.
+    """
+    sink = _ZipSink()
+    index = 0
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for start in range(0, len(page_ids), PAGES_PER_FETCH):
+            chunk_ids = page_ids[start:start + PAGES_PER_FETCH]
+            cursor = pages_collection.find(
+                {"_id": {"$in": chunk_ids}, "status": "done"},
+                {"filename": 1, "translated_image": 1},
+            )
+            pages = {page["_id"]: page async for page in cursor}
+
+            for page_id in chunk_ids:
+                page = pages.pop(page_id, None)
+                if not page or not page.get("translated_image"):
+                    continue
+                index += 1
+                image_bytes = base64.b64decode(page["translated_image"])
+                info = zipfile.ZipInfo(archive_entry_name(index, page.get("filename", "")))
+                info.compress_type = zipfile.ZIP_STORED
+                info.file_size = len(image_bytes)
+                with archive.open(info, mode="w") as entry:
+                    for offset in range(0, len(image_bytes), CHUNK_SIZE):
+                        entry.write(image_bytes[offset:offset + CHUNK_SIZE])
+                        data = sink.drain()
+                        if data:
+                            yield data
+                del image_bytes
+                data = sink.drain()
+                if data:
+                    yield data
+    # Répertoire central écrit à la fermeture de l'archive
+    data = sink.drain()
+    if data:
+        yield data
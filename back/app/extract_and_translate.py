@@ -1,17 +1,14 @@
 from PIL import Image
 import pytesseract
-from transformers import MarianTokenizer, MarianMTModel
 import string
+from app.model_pool import translation_pool, DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG
+from app.languages import UNSPACED_LANGUAGES, tesseract_language
 
 # Pour Linux/Mac, Tesseract doit être dans le PATH, donc cette ligne peut être commentée ou adaptée :
 # pytesseract.pytesseract.tesseract_cmd = r'/usr/bin/tesseract'  # Exemple pour Linux
 # Si tesseract est dans le PATH, ne rien mettre :
 # pytesseract.pytesseract.tesseract_cmd = r'C:/Program Files/Tesseract-OCR/tesseract.exe'
 
-model_name = 'Helsinki-NLP/opus-mt-en-fr'
-tokenizer = MarianTokenizer.from_pretrained(model_name)
-model = MarianMTModel.from_pretrained(model_name)
-
 def yolo_to_pixel(box, img_width, img_height):
     x_center, y_center, w, h = box
     x_center *= img_width
@@ -32,17 +29,21 @@ def yolo_to_pixel(box, img_width, img_height):
 
 
 
-def clean_text(region):
-    text = pytesseract.image_to_string(region).strip()
+def clean_text(region, source_lang=DEFAULT_SOURCE_LANG):
+    text = pytesseract.image_to_string(region, lang=tesseract_language(source_lang)).strip()
+    if source_lang in UNSPACED_LANGUAGES:
+        # Japonais : lignes recollées sans espace, ponctuation pleine chasse conservée pour Marian
+        return "".join(text.split())
     text = text.replace('\n', ' ').replace('\t', ' ').replace('- ', '-')
     punct_to_remove = string.punctuation.replace("'", "")
     translator = str.maketrans('', '', punct_to_remove)
     cleaned_text = text.translate(translator).lower()
     return cleaned_text
 
-def extract_and_translate(image, yolo_boxes):
+def extract_and_translate(image, yolo_boxes, source_lang=DEFAULT_SOURCE_LANG, target_lang=DEFAULT_TARGET_LANG):
     width, height = image.size
     results = []
+    tokenizer, model = translation_pool.get(source_lang, target_lang)
 
     for box in yolo_boxes:
         pixel_box = yolo_to_pixel(box, width, height)
@@ -50,7 +51,7 @@ def extract_and_translate(image, yolo_boxes):
             continue
         
         region = image.crop(pixel_box)
-        text = clean_text(region)
+        text = clean_text(region, source_lang)
 
         if text:
             inputs = tokenizer(text, return_tensors="pt", truncation=True)
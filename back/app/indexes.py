@@ -0,0 +1,93 @@
+"""Index MongoDB alignés sur les requêtes de l'API.
+
+INDEXES est la source de vérité : ensure_indexes() crée les index déclarés
+puis supprime ceux de OBSOLETE_INDEXES, remplacés par les premiers. Les index
+ajoutés par un opérateur ne sont jamais touchés. QUERY_SHAPES recense la forme de chaque
+requête de app.main et app.retention (filtre + tri) ;
+benchmarks/check_query_plans.py vérifie par explain() qu'aucune ne fait de
+COLLSCAN ni de SORT en mémoire.
+"""
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger("uvicorn.error")
+
+INDEXES = {
+    "users": [
+        IndexModel([("pseudo", ASCENDING)], unique=True),
+    ],
+    "batches": [
+        # Liste des batches d'un utilisateur, plus récents d'abord ; parcours des
+        # utilisateurs par le quota de app.retention
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        # Sélection des batches à purger ou compacter par app.retention
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        # Batches en échec seulement : la purge ne parcourt pas les batches terminés
+        IndexModel([("created_at", ASCENDING)],
+                   partialFilterExpression={"status": "completed", "pages_done": 0}),
+    ],
+    "pages": [
+        # Pages terminées d'un batch (flux /batch/{id}/stream) ; les lectures par id passent par _id
+        IndexModel([("batch_id", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "translated_pages": [
+        IndexModel([("page_id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("translation_completed_at", DESCENDING)]),
+        IndexModel([("batch_id", ASCENDING), ("user_id", ASCENDING), ("translation_completed_at", ASCENDING)]),
+    ],
+}
+
+# Index des versions précédentes, supprimés une fois leurs remplaçants créés
+OBSOLETE_INDEXES = {
+    "batches": ["user_id_1"],
+    "pages": ["page_id_1", "batch_id_1_page_id_1"],
+    "translated_pages": ["user_id_1_batch_id_1"],
+}
+
+# (collection, filtre, tri) de chaque requête de app.main et app.retention, avec des valeurs d'exemple
+QUERY_SHAPES = [
+    ("users", {"pseudo": "reader"}, None),
+    ("batches", {"_id": "batch-1", "user_id": "user-1"}, None),
+    ("batches", {"user_id": "user-1"}, [("created_at", DESCENDING)]),
+    ("batches", {"user_id": {"$gt": "user-1"}}, [("user_id", ASCENDING)]),
+    ("batches", {"status": {"$in": ["pending", "processing"]}, "created_at": {"$lt": datetime(2024, 1, 1)}}, None),
+    ("batches", {"status": "completed", "pages_done": 0, "created_at": {"$lt": datetime(2024, 1, 1)}}, None),
+    ("batches", {"status": "completed", "created_at": {"$gte": datetime(2023, 1, 1), "$lt": datetime(2024, 1, 1)},
+                 "originals_compacted": {"$ne": True}}, [("created_at", ASCENDING)]),
+    ("pages", {"_id": {"$in": ["page-1", "page-2"]}}, None),
+    ("pages", {"_id": {"$in": ["page-1", "page-2"]}, "status": "done"}, None),
+    ("pages", {"_id": "page-1"}, None),
+    ("pages", {"batch_id": "batch-1", "status": {"$in": ["done", "error"]}}, None),
+    ("pages", {"batch_id": "batch-1", "status": "done"}, None),
+    ("pages", {"batch_id": {"$in": ["batch-1", "batch-2"]}}, None),
+    ("translated_pages", {"page_id": "page-1"}, None),
+    ("translated_pages", {"batch_id": {"$in": ["batch-1", "batch-2"]}}, None),
+    ("translated_pages", {"user_id": "user-1"}, [("translation_completed_at", DESCENDING)]),
+    ("translated_pages", {"batch_id": "batch-1", "user_id": "user-1"}, [("translation_completed_at", ASCENDING)]),
+]
+
+
+async def ensure_indexes(db):
+    """Crée les index déclarés, puis supprime les index obsolètes encore présents.
+
+    Les créations passent d'abord : pendant un déploiement progressif, les
+    requêtes de l'ancienne version gardent leurs index jusqu'à ce que les
+    nouveaux existent. create_indexes est sans effet pour un index identique
+    déjà présent, ce qui rend l'appel sûr depuis chaque worker.
+    """
+    for collection_name, models in INDEXES.items():
+        await db[collection_name].create_indexes(models)
+    for collection_name, names in OBSOLETE_INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                logger.info(f"Suppression de l'index obsolète {collection_name}.{name}")
+                try:
+                    await collection.drop_index(name)
+                except OperationFailure as e:
+                    # Déjà supprimé par un autre worker
+                    logger.info(f"Index {collection_name}.{name} non supprimé: {e}")
@@ -0,0 +1,48 @@
+"""Paires de langues acceptées par l'API.
+
+Chaque paire correspond au modèle Helsinki-NLP/opus-mt-{source}-{cible}.
+Les paires demandées sont vérifiées à l'upload : une valeur envoyée par un
+client ne déclenche jamais le téléchargement d'un modèle arbitraire. La
+langue source doit aussi avoir ses données Tesseract (TESSERACT_LANGUAGES,
+installées par le Dockerfile).
+
+Variables d'environnement :
+    DEFAULT_SOURCE_LANG        défaut en
+    DEFAULT_TARGET_LANG        défaut fr
+    SUPPORTED_LANGUAGE_PAIRS   "source-cible" séparées par des virgules, défaut en-fr,en-es,en-de,ja-en
+"""
+import os
+from typing import Tuple
+
+DEFAULT_SOURCE_LANG = os.getenv("DEFAULT_SOURCE_LANG", "en")
+DEFAULT_TARGET_LANG = os.getenv("DEFAULT_TARGET_LANG", "fr")
+
+SUPPORTED_LANGUAGE_PAIRS = frozenset(
+    tuple(pair.strip().split("-", 1))
+    for pair in os.getenv("SUPPORTED_LANGUAGE_PAIRS", "en-fr,en-es,en-de,ja-en").split(",")
+    if pair.strip()
+) | {(DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG)}
+
+
+# Données Tesseract par langue source ; jpn_vert pour les bulles en colonnes
+TESSERACT_LANGUAGES = {
+    "en": "eng",
+    "fr": "fra",
+    "es": "spa",
+    "de": "deu",
+    "ja": "jpn+jpn_vert",
+}
+# Écritures sans espaces entre les mots ni casse : pas de nettoyage ASCII après l'OCR
+UNSPACED_LANGUAGES = {"ja"}
+
+
+def tesseract_language(source_lang: str) -> str:
+    return TESSERACT_LANGUAGES[source_lang]
+
+
+def resolve_language_pair(source_lang: str, target_lang: str) -> Tuple[str, str]:
+    pair = (source_lang, target_lang)
+    if pair not in SUPPORTED_LANGUAGE_PAIRS or source_lang not in TESSERACT_LANGUAGES:
+        choices = ", ".join(sorted(f"{s}-{t}" for s, t in SUPPORTED_LANGUAGE_PAIRS))
+        raise ValueError(f"Paire de langues non supportée: {source_lang}-{target_lang} (choix: {choices})")
+    return pair
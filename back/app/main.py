@@ -1,5 +1,16 @@
-from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException, Header, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, WebSocket, WebSocketDisconnect, HTTPException, Header, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from .export import EXPORT_FORMATS, stream_batch_archive
+from .persistence import BulkWriter
+from .users import find_user, resolve_user
+from .events import batch_event, create_broker, format_event, page_event
+from .streaming import STREAM_FORMATS, stream_batch_pages
+from .decoding import resolve_profile
+from .languages import resolve_language_pair
+from .processing import processing_pool
+from .indexes import ensure_indexes
+from .retention import RetentionTask
 from .mock_data import MOCK_BATCH_STATUS, MOCK_BATCH_RESULT, MOCK_UPLOAD_BATCH_RESPONSE
 from .models import (
     User, Batch, PageInitial, TranslatedPage,
@@ -11,6 +22,7 @@ from .models import (
 )
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne
 import os
 from datetime import datetime
 import uuid
@@ -19,7 +31,6 @@ import io
 from PIL import Image
 import asyncio
 import logging
-from app.script_for_app import process_image
 
 # Setup logger
 logger = logging.getLogger("uvicorn.error")
@@ -55,25 +66,51 @@ MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
 async def startup_db_client():
     app.mongodb_client = AsyncIOMotorClient(MONGO_URL)
     app.mongodb = app.mongodb_client["scantrad_db"]
-    # Create indexes
-    await app.mongodb.users.create_index("pseudo", unique=True)
-    await app.mongodb.batches.create_index("user_id")
-    await app.mongodb.pages.create_index([("batch_id", 1), ("page_id", 1)])
-    await app.mongodb.pages.create_index("page_id", unique=True)
-    await app.mongodb.translated_pages.create_index([("user_id", 1), ("batch_id", 1)])
-    await app.mongodb.translated_pages.create_index("page_id", unique=True)
+    # Index déclarés dans app.indexes, alignés sur les requêtes ci-dessous
+    await ensure_indexes(app.mongodb)
     logger.info("MongoDB connecté et indexes créés")
+    # La progression passe par le broker : avec EVENT_BROKER=changestream,
+    # chaque réplica relaie à ses WebSockets les pages traitées ailleurs
+    app.broker = create_broker(app.mongodb)
+    await app.broker.start()
+    app.relay_task = asyncio.create_task(relay_events())
+    processing_pool.start()
+    app.retention = RetentionTask(app.mongodb)
+    app.retention.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.relay_task.cancel()
+    await app.retention.stop()
+    processing_pool.shutdown()
+    await app.broker.stop()
     app.mongodb_client.close()
 
 async def get_user_by_pseudo(pseudo: str):
-    user = await app.mongodb.users.find_one({"pseudo": pseudo})
+    return await resolve_user(app.mongodb.users, pseudo)
+
+# Dépendances partagées de résolution d'utilisateur (cache pseudo -> id, voir app.users)
+async def current_user(x_user_pseudo: Optional[str] = Header(None)):
+    if not x_user_pseudo:
+        raise HTTPException(status_code=401, detail="Header X-User-Pseudo requis")
+    return await get_user_by_pseudo(x_user_pseudo)
+
+async def existing_user(x_user_pseudo: Optional[str] = Header(None)):
+    if not x_user_pseudo:
+        raise HTTPException(status_code=401, detail="User pseudo requis")
+    user = await find_user(app.mongodb.users, x_user_pseudo)
     if not user:
-        new_user = {"_id": str(uuid.uuid4()), "pseudo": pseudo, "created_at": datetime.utcnow()}
-        await app.mongodb.users.insert_one(new_user)
-        return new_user
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return user
+
+async def query_or_header_user(x_user_pseudo: Optional[str] = Header(None), pseudo: Optional[str] = None):
+    # EventSource et <img> ne peuvent pas envoyer d'en-tête : pseudo accepté en paramètre ?pseudo=
+    return await existing_user(x_user_pseudo or pseudo)
+
+async def path_user(pseudo: str):
+    user = await find_user(app.mongodb.users, pseudo)
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     return user
 
 class ConnectionManager:
@@ -104,6 +141,11 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+async def relay_events():
+    async with app.broker.subscribe() as events:
+        async for event in events:
+            await manager.broadcast(format_event(event))
+
 @app.post("/auth/login")
 async def login(request: LoginRequest):
     if not request.pseudo or len(request.pseudo) < 2:
@@ -115,14 +157,21 @@ async def login(request: LoginRequest):
 async def upload_batch(
     background_tasks: BackgroundTasks,
     request: UploadBatchRequest,
-    x_user_pseudo: Optional[str] = Header(None)
+    user: dict = Depends(current_user)
 ):
-    if not x_user_pseudo:
-        raise HTTPException(status_code=401, detail="Header X-User-Pseudo requis")
-    user = await get_user_by_pseudo(x_user_pseudo)
+
+    try:
+        decoding_profile = resolve_profile(request.decoding_profile)
+        resolve_language_pair(request.source_lang, request.target_lang)
+        for page_request in request.pages:
+            resolve_language_pair(page_request.source_lang or request.source_lang,
+                                  page_request.target_lang or request.target_lang)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     batch_id = str(uuid.uuid4())
     page_to_process: List[PageInitial] = []
+    page_dicts = []
 
     for page_request in request.pages:
         page_id = str(uuid.uuid4())
@@ -134,93 +183,123 @@ async def upload_batch(
             original_image=page_request.image_base64,
             translated_image=None,
             original_url=f"data:image/jpeg;base64,{page_request.image_base64}",
-            translated_url=None
+            translated_url=None,
+            source_lang=page_request.source_lang or request.source_lang,
+            target_lang=page_request.target_lang or request.target_lang
         )
         page_to_process.append(page_data)
 
         page_dict = page_data.dict()
         page_dict["_id"] = page_dict["page_id"]
-        await app.mongodb.pages.insert_one(page_dict)
+        page_dicts.append(page_dict)
+
+    # Un seul aller-retour pour toutes les pages du batch
+    if page_dicts:
+        await app.mongodb.pages.insert_many(page_dicts, ordered=True)
 
     batch = Batch(id=batch_id, user_id=user["_id"],
                   pages_ids=[p.page_id for p in page_to_process],
-                  created_at=datetime.utcnow(), status="processing")
+                  created_at=datetime.utcnow(), status="processing",
+                  decoding_profile=decoding_profile,
+                  source_lang=request.source_lang, target_lang=request.target_lang)
     batch_dict = batch.dict()
     batch_dict["_id"] = batch_dict.pop("id")
     await app.mongodb.batches.insert_one(batch_dict)
 
-    #background_tasks.add_task(transform_processing, batch_id, user["_id"], page_to_process)
-    await transform_processing(batch_id, user["_id"], page_to_process)
+    # Traitement après l'envoi de la réponse : le client reçoit batchId tout de suite
+    # et peut suivre les pages sur /batch/{batch_id}/stream
+    background_tasks.add_task(transform_processing, batch_id, user["_id"], page_to_process, decoding_profile)
     logger.info(f"Batch {batch_id} queued for processing")
     return UploadBatchResponse(batchId=batch_id)
 
-async def transform_processing(batch_id: str, user_id: str, pages: List[PageInitial]):
+def group_pages_by_model(pages: List[PageInitial]) -> List[PageInitial]:
+    """Regroupe les pages par paire de langues pour limiter les changements de modèle"""
+    first_seen = {}
+    for page in pages:
+        first_seen.setdefault((page.source_lang, page.target_lang), len(first_seen))
+    return sorted(pages, key=lambda p: first_seen[(p.source_lang, p.target_lang)])
+
+async def transform_processing(batch_id: str, user_id: str, pages: List[PageInitial],
+                               decoding_profile: Optional[str] = None):
     logger.info(f"Traitement du batch {batch_id} démarré")
-    batch = await app.mongodb.batches.find_one({"_id": batch_id})
-    if not batch:
-        return
-    for page_data in pages:
-        page_id = page_data.page_id
-        page = await app.mongodb.pages.find_one({"_id": page_id})
-        print("page-id" + page_id)
-        if not page:
-            print('je suis dehors')
-            continue
-        print("y'a match")
-
-        print("j'ai atttendu")
-        await app.mongodb.pages.update_one({"_id": page_id}, {"$set": {"status": "processing"}})
-        await manager.broadcast(f"Page {page['filename']} is processing")
+    # Les pages viennent d'être insérées par upload_batch : inutile de les relire,
+    # les mises à jour de statut sont regroupées en bulk_write
+    pages_writer = BulkWriter(app.mongodb.pages)
+    translated_writer = BulkWriter(app.mongodb.translated_pages)
+    pages_done = 0
+    ordered = group_pages_by_model(pages)
+    try:
+        for index, page in enumerate(ordered):
+            page_id = page.page_id
+            if index == 0:
+                await pages_writer.add(UpdateOne({"_id": page_id}, {"$set": {"status": "processing"}}))
+            await app.broker.publish(page_event(page_id, batch_id, page.filename, "processing"))
 
-        try:
-            image_input = base64.b64decode(page['original_image'])
-            image_data = Image.open(io.BytesIO(image_input)).convert("RGB")
-            translated_image = process_image(image_data)
-            buffer = io.BytesIO()
-            translated_image.save(buffer, format="PNG")
-            img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            translated_url = f"data:image/png;base64,{img_base64}"
-
-            await app.mongodb.pages.update_one(
-                {"_id": page_id},
-                {"$set": {
-                    "status": "done",
+            try:
+                # Décodage, traduction et encodage PNG dans un processus de traitement
+                img_base64 = await processing_pool.process(
+                    page.original_image, decoding_profile, page.source_lang, page.target_lang
+                )
+                translated_url = f"data:image/png;base64,{img_base64}"
+
+                await pages_writer.add(UpdateOne(
+                    {"_id": page_id},
+                    {"$set": {
+                        "status": "done",
+                        "translated_image": img_base64,
+                        "translated_url": translated_url
+                    }}
+                ))
+                translated_page = {
+                    "_id": str(uuid.uuid4()),
+                    "page_id": page_id,
+                    "user_id": user_id,
+                    "batch_id": batch_id,
+                    "filename": page.filename,
+                    "original_image": page.original_image,
                     "translated_image": img_base64,
-                    "translated_url": translated_url
-                }}
-            )
-            translated_page = {
-                "_id": str(uuid.uuid4()),
-                "page_id": page_id,
-                "user_id": user_id,
-                "batch_id": batch_id,
-                "filename": page["filename"],
-                "original_image": page["original_image"],
-                "translated_image": img_base64,
-                "original_url": page["original_url"],
-                "translated_url": translated_url,
-                "translation_completed_at": datetime.utcnow(),
-                "processing_time_seconds": 3
-            }
-            await app.mongodb.translated_pages.insert_one(translated_page)
-            await manager.broadcast(f"Page {page['filename']} is done")
-        except Exception as e:
-            logger.error(f"Erreur sur la page {page['filename']}: {e}")
-            await app.mongodb.pages.update_one(
-                {"_id": page_id},
-                {"$set": {"status": "error", "error_message": str(e)}}
-            )
-            await manager.broadcast(f"Page {page['filename']} failed: {str(e)}")
-
-    await app.mongodb.batches.update_one({"_id": batch_id}, {"$set": {"status": "completed"}})
+                    "original_url": page.original_url,
+                    "translated_url": translated_url,
+                    "translation_completed_at": datetime.utcnow(),
+                    "processing_time_seconds": 3
+                }
+                await translated_writer.add(InsertOne(translated_page))
+                pages_done += 1
+                event = page_event(page_id, batch_id, page.filename, "done")
+            except Exception as e:
+                logger.error(f"Erreur sur la page {page.filename}: {e}")
+                await pages_writer.add(UpdateOne(
+                    {"_id": page_id},
+                    {"$set": {"status": "error", "error_message": str(e)}}
+                ))
+                event = page_event(page_id, batch_id, page.filename, "error", str(e))
+
+            # Un bulk_write par page : fin de cette page et passage de la suivante en processing.
+            # translated_image doit être en base avant d'annoncer la page (image_url du flux)
+            if index + 1 < len(ordered):
+                await pages_writer.add(UpdateOne({"_id": ordered[index + 1].page_id},
+                                                 {"$set": {"status": "processing"}}))
+            await pages_writer.flush()
+            await app.broker.publish(event)
+    finally:
+        # close() lève si des écritures ont échoué même après nouvelle tentative : le batch
+        # n'est alors pas marqué completed ; la rétention le clôt après le TTL des batches
+        # interrompus, en conservant les pages traduites
+        try:
+            await pages_writer.close()
+        finally:
+            await translated_writer.close()
+
+    # pages_done = 0 : batch en échec, purgé par la rétention (app.retention)
+    await app.mongodb.batches.update_one({"_id": batch_id}, {"$set": {
+        "status": "completed",
+        "pages_done": pages_done,
+        "pages_failed": len(pages) - pages_done
+    }})
+    await app.broker.publish(batch_event(batch_id, "completed"))
 
 @app.get("/result/{batch_id}")
-async def get_result(batch_id: str, x_user_pseudo: Optional[str] = Header(None)):
-    if not x_user_pseudo:
-        raise HTTPException(status_code=401, detail="User pseudo requis")
-    user = await app.mongodb.users.find_one({"pseudo": x_user_pseudo})
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+async def get_result(batch_id: str, user: dict = Depends(existing_user)):
 
     batch = await app.mongodb.batches.find_one({"_id": batch_id, "user_id": user["_id"]})
     if not batch:
@@ -231,17 +310,18 @@ async def get_result(batch_id: str, x_user_pseudo: Optional[str] = Header(None))
     return {"pages": pages}
 
 @app.get("/user/{pseudo}/batches")
-async def get_user_batches(pseudo: str):
-    user = await app.mongodb.users.find_one({"pseudo": pseudo})
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+async def get_user_batches(user: dict = Depends(path_user)):
 
-    batches = await app.mongodb.batches.find({"user_id": user["_id"]}).to_list(100)
+    batches = await app.mongodb.batches.find(
+        {"user_id": user["_id"]}
+    ).sort("created_at", -1).to_list(100)
     result = []
 
     for batch in batches:
         page_ids = batch.get("pages_ids", [])
-        pages = await app.mongodb.pages.find({"_id": {"$in": page_ids}}).to_list(len(page_ids))
+        pages = await app.mongodb.pages.find(
+            {"_id": {"$in": page_ids}}, {"status": 1}
+        ).to_list(len(page_ids))
         statuses = [p.get("status", "pending") for p in pages]
 
         if statuses:
@@ -266,10 +346,7 @@ async def get_user_batches(pseudo: str):
     return {"batches": result}
 
 @app.get("/user/{pseudo}/translated-pages", response_model=TranslatedPagesResponse)
-async def get_user_translated_pages(pseudo: str):
-    user = await app.mongodb.users.find_one({"pseudo": pseudo})
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+async def get_user_translated_pages(user: dict = Depends(path_user)):
 
     translated = await app.mongodb.translated_pages.find(
         {"user_id": user["_id"]}
@@ -282,18 +359,65 @@ async def get_user_translated_pages(pseudo: str):
     return TranslatedPagesResponse(translated_pages=pages)
 
 @app.get("/batch/{batch_id}/translated-pages")
-async def get_batch_translated_pages(batch_id: str, x_user_pseudo: Optional[str] = Header(None)):
-    if not x_user_pseudo:
-        raise HTTPException(status_code=401, detail="User pseudo requis")
-    user = await app.mongodb.users.find_one({"pseudo": x_user_pseudo})
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+async def get_batch_translated_pages(batch_id: str, user: dict = Depends(existing_user)):
 
     translated = await app.mongodb.translated_pages.find(
         {"batch_id": batch_id, "user_id": user["_id"]}
     ).sort("translation_completed_at", 1).to_list(100)
     return {"translated_pages": translated}
 
+@app.get("/batch/{batch_id}/export")
+async def export_batch(batch_id: str, format: str = "cbz", user: dict = Depends(existing_user)):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format doit être 'cbz' ou 'zip'")
+
+    batch = await app.mongodb.batches.find_one(
+        {"_id": batch_id, "user_id": user["_id"]}, {"pages_ids": 1}
+    )
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch non trouvé")
+
+    # L'archive est générée page par page et envoyée en chunked, sans être construite en mémoire
+    return StreamingResponse(
+        stream_batch_archive(app.mongodb.pages, batch.get("pages_ids", [])),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{batch_id}.{format}"'}
+    )
+
+@app.get("/batch/{batch_id}/stream")
+async def stream_batch(batch_id: str, format: str = "ndjson", user: dict = Depends(query_or_header_user)):
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="Format doit être 'ndjson' ou 'sse'")
+    batch = await app.mongodb.batches.find_one({"_id": batch_id, "user_id": user["_id"]}, {"_id": 1})
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch non trouvé")
+
+    return StreamingResponse(
+        stream_batch_pages(app.mongodb, app.broker, batch_id, format, user["pseudo"]),
+        media_type=STREAM_FORMATS[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/page/{page_id}/translated.png")
+async def get_translated_image(page_id: str, user: dict = Depends(query_or_header_user)):
+    page = await app.mongodb.pages.find_one({"_id": page_id}, {"translated_image": 1, "batch_id": 1})
+    if not page or not page.get("translated_image"):
+        raise HTTPException(status_code=404, detail="Image traduite non trouvée")
+    batch = await app.mongodb.batches.find_one({"_id": page["batch_id"], "user_id": user["_id"]}, {"_id": 1})
+    if not batch:
+        raise HTTPException(status_code=404, detail="Image traduite non trouvée")
+    return Response(content=base64.b64decode(page["translated_image"]), media_type="image/png")
+
+@app.get("/models")
+async def get_models():
+    # Par processus de traitement : modèles chargés, mémoire courante et pic de RSS
+    return processing_pool.stats()
+
+@app.get("/admin/retention")
+async def get_retention_metrics():
+    # Octets récupérés et documents purgés ou compactés par la rétention
+    return app.retention.metrics.as_dict()
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     await manager.connect(ws)
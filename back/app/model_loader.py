@@ -2,7 +2,7 @@ import sys
 import os
 from pathlib import Path
 from ultralytics import YOLO
-from transformers import MarianTokenizer, MarianMTModel
+from app.model_pool import translation_pool
 
 # Trouver dynamiquement le répertoire racine du projet "scantrad"
 def find_project_root():
@@ -78,19 +78,17 @@ class ModelLoader:
             print("Modèle YOLO non trouvé")
             self.yolo_model = None
         
-        # Charger le modèle de traduction
-        try:
-            model_name = 'Helsinki-NLP/opus-mt-en-fr'
-            self.tokenizer = MarianTokenizer.from_pretrained(model_name)
-            self.translation_model = MarianMTModel.from_pretrained(model_name)
-            print("Modèle de traduction chargé avec succès")
-        except Exception as e:
-            print(f"Erreur lors du chargement du modèle de traduction: {e}")
-            self.tokenizer = None
-            self.translation_model = None
-        
+        # Les modèles de traduction sont chargés au premier usage par translation_pool
         self._initialized = True
         print("Models loading completed!")
 
+    @property
+    def tokenizer(self):
+        return translation_pool.get()[0]
+
+    @property
+    def translation_model(self):
+        return translation_pool.get()[1]
+
 # Instance globale
 model_loader = ModelLoader()
@@ -0,0 +1,118 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from transformers import MarianMTModel, MarianTokenizer
+
+from app.languages import DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG, resolve_language_pair
+
+logger = logging.getLogger("uvicorn.error")
+
+# Budget mémoire des modèles de traduction chargés, par processus de traitement :
+# la machine en héberge jusqu'à WEB_CONCURRENCY × PROCESSING_WORKERS fois ce budget
+TRANSLATION_MEMORY_BUDGET_MB = int(os.getenv("TRANSLATION_MEMORY_BUDGET_MB", "1500"))
+
+
+def model_name_for(source_lang: str, target_lang: str) -> str:
+    return f"Helsinki-NLP/opus-mt-{source_lang}-{target_lang}"
+
+
+def resident_size_bytes(model) -> int:
+    """Taille des poids et buffers du modèle en mémoire"""
+    size = sum(p.numel() * p.element_size() for p in model.parameters())
+    size += sum(b.numel() * b.element_size() for b in model.buffers())
+    return size
+
+
+class LoadedModel:
+    def __init__(self, name: str, tokenizer, model, load_seconds: float):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.load_seconds = load_seconds
+        self.size_bytes = resident_size_bytes(model)
+        self.uses = 0
+
+
+class TranslationModelPool:
+    """Modèles Marian par paire de langues, chargés au premier usage.
+
+    Les modèles sont partagés entre requêtes. Quand la taille cumulée dépasse
+    le budget, les moins récemment utilisés sont libérés (jamais celui demandé).
+    """
+
+    def __init__(self, memory_budget_mb: int = TRANSLATION_MEMORY_BUDGET_MB):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self._models: "OrderedDict[Tuple[str, str], LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get(self, source_lang: str = DEFAULT_SOURCE_LANG, target_lang: str = DEFAULT_TARGET_LANG):
+        """Retourne (tokenizer, modèle) pour la paire, en le chargeant au besoin.
+
+        Lève ValueError pour une paire hors de SUPPORTED_LANGUAGE_PAIRS.
+        """
+        key = resolve_language_pair(source_lang, target_lang)
+        loaded = self._touch(key)
+        if loaded is None:
+            with self._lock:
+                loading_lock = self._loading_locks.setdefault(key, threading.Lock())
+            # Un seul chargement par paire, sans bloquer les autres paires
+            with loading_lock:
+                loaded = self._touch(key) or self._load(key)
+        loaded.uses += 1
+        return loaded.tokenizer, loaded.model
+
+    def _touch(self, key):
+        with self._lock:
+            loaded = self._models.get(key)
+            if loaded is not None:
+                self._models.move_to_end(key)
+            return loaded
+
+    def _load(self, key) -> LoadedModel:
+        name = model_name_for(*key)
+        start = time.perf_counter()
+        tokenizer = MarianTokenizer.from_pretrained(name)
+        model = MarianMTModel.from_pretrained(name)
+        model.eval()
+        loaded = LoadedModel(name, tokenizer, model, time.perf_counter() - start)
+        logger.info(f"Modèle {name} chargé en {loaded.load_seconds:.1f}s "
+                    f"({loaded.size_bytes / 1024 / 1024:.0f} Mo)")
+        with self._lock:
+            self._models[key] = loaded
+            self._evict()
+        return loaded
+
+    def _evict(self):
+        evicted = False
+        while len(self._models) > 1 and self.total_bytes() > self.memory_budget_bytes:
+            key, loaded = self._models.popitem(last=False)
+            logger.info(f"Modèle {loaded.name} libéré (budget mémoire dépassé)")
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def total_bytes(self) -> int:
+        return sum(loaded.size_bytes for loaded in self._models.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "resident_bytes": self.total_bytes(),
+                "models": [
+                    {"source_lang": key[0], "target_lang": key[1], "name": loaded.name,
+                     "load_seconds": round(loaded.load_seconds, 3),
+                     "size_bytes": loaded.size_bytes, "uses": loaded.uses}
+                    for key, loaded in self._models.items()
+                ],
+            }
+
+
+# Instance globale
+translation_pool = TranslationModelPool()
@@ -2,6 +2,8 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
+from app.languages import DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG
+
 class User(BaseModel):
     id: Optional[str] = None
     pseudo: str
@@ -16,6 +18,8 @@ class PageInitial(BaseModel):
     translated_image: Optional[str] = None  # base64
     original_url: Optional[str] = None
     translated_url: Optional[str] = None
+    source_lang: str = DEFAULT_SOURCE_LANG
+    target_lang: str = DEFAULT_TARGET_LANG
 
 # Alias pour la compatibilité
 PageData = PageInitial
@@ -26,6 +30,9 @@ class Batch(BaseModel):
     pages_ids: List[str]  # ← Revenir à pages_ids pour correspondre à votre implémentation
     created_at: Optional[datetime] = None
     status: str = "pending"
+    decoding_profile: Optional[str] = None  # fast, balanced, quality
+    source_lang: str = DEFAULT_SOURCE_LANG
+    target_lang: str = DEFAULT_TARGET_LANG
 
 class TranslatedPage(BaseModel):
     id: Optional[str] = None
@@ -61,6 +68,11 @@ class TranslatedPagesResponse(BaseModel):
 class PageUploadRequest(BaseModel):
     filename: str
     image_base64: str  # Image déjà encodée en base64
+    source_lang: Optional[str] = None  # Surcharge la langue du batch pour cette page
+    target_lang: Optional[str] = None
 
 class UploadBatchRequest(BaseModel):
-    pages: List[PageUploadRequest]
\ No newline at end of file
+    pages: List[PageUploadRequest]
+    decoding_profile: Optional[str] = None  # fast, balanced, quality (défaut : DECODING_PROFILE)
+    source_lang: str = DEFAULT_SOURCE_LANG  # ex. en, ja
+    target_lang: str = DEFAULT_TARGET_LANG  # ex. fr, en, es, de
\ No newline at end of file
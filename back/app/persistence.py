@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger("uvicorn.error")
+
+# Seuils de regroupement des écritures : flush dès que l'un des deux est atteint
+BULK_MAX_OPS = int(os.getenv("BULK_MAX_OPS", "50"))
+BULK_FLUSH_INTERVAL = float(os.getenv("BULK_FLUSH_INTERVAL", "0.25"))
+DUPLICATE_KEY = 11000
+
+
+class BulkWriter:
+    """Regroupe les opérations d'écriture d'une collection en un seul bulk_write.
+
+    Les opérations (UpdateOne, InsertOne, ...) sont accumulées puis envoyées
+    en un aller-retour Mongo dès que max_ops est atteint ou que flush_interval
+    s'est écoulé depuis la première opération en attente. L'ordre est conservé.
+
+    Un bulk_write en échec remet ses opérations en tête de file : elles sont
+    retentées au flush suivant, et close() lève l'erreur si elles n'ont
+    toujours pas pu être écrites.
+    """
+
+    def __init__(self, collection, max_ops: int = BULK_MAX_OPS, flush_interval: float = BULK_FLUSH_INTERVAL):
+        self.collection = collection
+        self.max_ops = max_ops
+        self.flush_interval = flush_interval
+        self._ops: List = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, operation):
+        self._ops.append(operation)
+        if len(self._ops) >= self.max_ops:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Opérations remises en file par flush(), retentées au prochain flush ou à close()
+            logger.error(f"Echec du bulk_write différé sur {self.collection.name}: {e}")
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            ops, self._ops = self._ops, []
+            while ops:
+                try:
+                    await self.collection.bulk_write(ops, ordered=True)
+                    return
+                except BulkWriteError as e:
+                    # En mode ordonné, les opérations avant la première erreur sont appliquées
+                    error = e.details["writeErrors"][0]
+                    if error.get("code") == DUPLICATE_KEY:
+                        # Insertion déjà appliquée par une tentative précédente
+                        ops = ops[error["index"] + 1:]
+                        continue
+                    self._ops = ops[error["index"]:] + self._ops
+                    raise
+                except Exception:
+                    # Rejouer les $set déjà appliqués est sans effet
+                    self._ops = ops + self._ops
+                    raise
+
+    async def close(self):
+        await self.flush()
@@ -0,0 +1,225 @@
+"""Pool de processus de traitement des pages.
+
+Les modèles (YOLO, Marian, Tesseract) ne sont chargés que dans les processus
+de traitement : le processus de l'API reste léger et sa boucle d'événements
+n'est plus bloquée pendant la traduction d'une page.
+
+Les workers sont recyclés pour contenir la dérive mémoire (buffers PIL,
+allocateur torch, caches du tokenizer) :
+    WORKER_MAX_PAGES    pages traitées avant qu'un worker soit remplacé (0 = illimité)
+    WORKER_MAX_RSS_MB   RSS au-delà de laquelle le pool est drainé puis remplacé (0 = illimité)
+
+Un worker remplacé après WORKER_MAX_PAGES reprend le rang CPU libéré par celui
+qu'il remplace. Le remplacement du pool sur dépassement de RSS draine l'ancien
+pool avant de lancer le nouveau : les modèles ne sont jamais chargés deux fois
+en même temps, au prix d'une pause des nouvelles pages pendant le drainage.
+
+PROCESS_IMAGE_BACKEND ("module:fonction") choisit la fonction de traitement,
+par défaut le pipeline réel ; le harnais de charge y branche des faux modèles.
+"""
+import asyncio
+import atexit
+import base64
+import gc
+import io
+import logging
+import multiprocessing
+import os
+import importlib
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image
+
+from app.thread_budget import ThreadBudget, apply_thread_budget, claim_api_worker_slot, thread_budget
+
+logger = logging.getLogger("uvicorn.error")
+
+WORKER_MAX_PAGES = int(os.getenv("WORKER_MAX_PAGES", "200"))
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "3072"))
+PROCESS_IMAGE_BACKEND = os.getenv("PROCESS_IMAGE_BACKEND", "app.script_for_app:process_image")
+
+_pages_processed = 0
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_backend(path: str = PROCESS_IMAGE_BACKEND):
+    module_name, function_name = path.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _release_worker_slot(slots, index: int):
+    with slots.get_lock():
+        if slots[index] == os.getpid():
+            slots[index] = 0
+
+
+def _claim_worker_slot(slots) -> int:
+    """Réserve le premier rang libre (PID du worker) ; un rang dont le worker est mort est libre"""
+    with slots.get_lock():
+        for index, pid in enumerate(slots):
+            if pid == 0 or not _pid_alive(pid):
+                slots[index] = os.getpid()
+                atexit.register(_release_worker_slot, slots, index)
+                return index
+    logger.warning(f"Aucun rang CPU libre pour le worker {os.getpid()}")
+    return os.getpid() % len(slots)
+
+
+def _init_worker(slots, budget: ThreadBudget):
+    # Un worker remplacé reprend les cœurs de celui qu'il remplace
+    apply_thread_budget(budget, _claim_worker_slot(slots))
+    # Chargement des modèles au démarrage du worker plutôt qu'à la première page
+    load_backend()
+
+
+def process_page(original_image: str, decoding_profile: Optional[str], source_lang: str, target_lang: str):
+    """Traduit une page base64 et retourne (PNG base64, statistiques du worker)"""
+    global _pages_processed
+    process_image = load_backend()
+
+    image_data = Image.open(io.BytesIO(base64.b64decode(original_image))).convert("RGB")
+    translated_image = process_image(image_data, decoding_profile, source_lang, target_lang)
+    buffer = io.BytesIO()
+    translated_image.save(buffer, format="PNG")
+    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+    # Libération explicite des intermédiaires de la page avant la suivante
+    image_data.close()
+    translated_image.close()
+    buffer.close()
+    del image_data, translated_image, buffer
+    gc.collect()
+
+    _pages_processed += 1
+    stats = {
+        "pid": os.getpid(),
+        "pages_processed": _pages_processed,
+        "rss_bytes": current_rss_bytes(),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    # Pas d'import de transformers pour les backends qui n'utilisent pas le pool
+    if "app.model_pool" in sys.modules:
+        stats["models"] = sys.modules["app.model_pool"].translation_pool.stats()
+    return img_base64, stats
+
+
+class ProcessingPool:
+    def __init__(self, budget: ThreadBudget = thread_budget,
+                 max_pages_per_worker: int = WORKER_MAX_PAGES, max_rss_mb: int = WORKER_MAX_RSS_MB):
+        self.budget = budget
+        self.max_pages_per_worker = max_pages_per_worker
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.worker_stats: Dict[int, dict] = {}
+        self.recycled_pools = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = None
+        self._ready: Optional[asyncio.Event] = None
+        self._recycle_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        # Avant le premier executor : le budget (et son rang) est copié dans les workers
+        claim_api_worker_slot(self.budget)
+        self._ready = asyncio.Event()
+        self._executor = self._new_executor()
+        self._ready.set()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn : ne pas dupliquer la boucle asyncio ni le client Mongo du parent
+        context = multiprocessing.get_context("spawn")
+        if self._slots is None:
+            # PID du worker occupant chaque rang CPU, 0 si libre
+            self._slots = context.Array("i", self.budget.processing_workers)
+        return ProcessPoolExecutor(
+            max_workers=self.budget.processing_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._slots, self.budget),
+            # Remplacement transparent d'un worker après N pages
+            max_tasks_per_child=self.max_pages_per_worker or None,
+        )
+
+    def submit(self, original_image: str, decoding_profile: Optional[str], source_lang: str, target_lang: str):
+        return self._executor.submit(process_page, original_image, decoding_profile, source_lang, target_lang)
+
+    def submit_call(self, fn, *args):
+        """Exécute fn(*args) dans un worker du pool (préchauffage des benchmarks)"""
+        return self._executor.submit(fn, *args)
+
+    async def process(self, original_image: str, decoding_profile: Optional[str], source_lang: str, target_lang: str) -> str:
+        # Pendant un recyclage, les nouvelles pages attendent le pool neuf
+        await self._ready.wait()
+        executor = self._executor
+        img_base64, stats = await asyncio.wrap_future(
+            self.submit(original_image, decoding_profile, source_lang, target_lang)
+        )
+        self._record(stats)
+        if self.max_rss_bytes and stats["rss_bytes"] > self.max_rss_bytes \
+                and executor is self._executor and self._ready.is_set():
+            logger.warning(f"Worker {stats['pid']} à {stats['rss_bytes'] / 1024 / 1024:.0f} Mo, "
+                           f"recyclage du pool de traitement")
+            self._ready.clear()
+            self._recycle_task = asyncio.create_task(self.recycle())
+        return img_base64
+
+    def _record(self, stats: dict):
+        previous = self.worker_stats.get(stats["pid"], {})
+        stats["peak_rss_bytes"] = max(stats["peak_rss_bytes"], previous.get("peak_rss_bytes", 0))
+        self.worker_stats[stats["pid"]] = stats
+        # Garder aussi les derniers workers retirés, sans croissance illimitée
+        while len(self.worker_stats) > 4 * self.budget.processing_workers:
+            self.worker_stats.pop(next(iter(self.worker_stats)))
+
+    async def recycle(self):
+        """Remplace le pool : l'ancien termine ses pages et s'arrête avant le lancement du neuf.
+
+        Le pic mémoire reste celui d'un seul pool ; les pages soumises pendant
+        le drainage attendent dans process().
+        """
+        self._ready.clear()
+        try:
+            await asyncio.to_thread(self._executor.shutdown, wait=True)
+            self._executor = self._new_executor()
+            self.recycled_pools += 1
+        finally:
+            self._ready.set()
+
+    def stats(self) -> dict:
+        return {
+            "thread_budget": self.budget.describe(),
+            "max_pages_per_worker": self.max_pages_per_worker,
+            "max_rss_bytes": self.max_rss_bytes,
+            "recycled_pools": self.recycled_pools,
+            "workers": list(self.worker_stats.values()),
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+processing_pool = ProcessingPool()
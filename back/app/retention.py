@@ -0,0 +1,279 @@
+"""Politiques de rétention et compaction des batches et images.
+
+Une tâche de fond applique périodiquement, par petits lots espacés pour ne
+pas concurrencer le trafic de l'API :
+
+- batches interrompus (restés en processing au-delà du TTL : écriture en échec,
+  redémarrage pendant le traitement) : clôturés, les pages traduites sont
+  conservées et les autres passent en erreur ;
+- TTL des batches en échec (aucune page traduite) : supprimés ;
+- quota par utilisateur : seuls les N batches les plus récents sont conservés ;
+- compaction des vieux batches : les originaux base64 sont remplacés par une vignette.
+
+Chaque worker uvicorn lance la tâche, mais un bail dans la collection
+retention_state garantit qu'une seule passe s'exécute à la fois. Le bail
+porte aussi le curseur de compaction (created_at du dernier batch compacté).
+
+Variables d'environnement (0 désactive la politique) :
+    RETENTION_ENABLED                "0" pour ne pas lancer la tâche sur ce réplica
+    RETENTION_UNFINISHED_TTL_HOURS   défaut 24
+    RETENTION_MAX_BATCHES_PER_USER   défaut 0
+    RETENTION_THUMBNAIL_AFTER_DAYS   défaut 0
+    RETENTION_INTERVAL_SECONDS       délai entre deux passes, défaut 300
+    RETENTION_CHUNK_SIZE             batches traités par lot, défaut 20
+    RETENTION_CHUNK_PAUSE_SECONDS    pause entre deux lots, défaut 0.5
+    RETENTION_LEASE_SECONDS          durée du bail, renouvelé à chaque lot, défaut 60
+"""
+import asyncio
+import base64
+import io
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from bson.min_key import MinKey
+from PIL import Image
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("uvicorn.error")
+
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "1") == "1"
+UNFINISHED_TTL_HOURS = float(os.getenv("RETENTION_UNFINISHED_TTL_HOURS", "24"))
+MAX_BATCHES_PER_USER = int(os.getenv("RETENTION_MAX_BATCHES_PER_USER", "0"))
+THUMBNAIL_AFTER_DAYS = float(os.getenv("RETENTION_THUMBNAIL_AFTER_DAYS", "0"))
+INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "300"))
+CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "20"))
+CHUNK_PAUSE_SECONDS = float(os.getenv("RETENTION_CHUNK_PAUSE_SECONDS", "0.5"))
+LEASE_SECONDS = float(os.getenv("RETENTION_LEASE_SECONDS", "60"))
+
+THUMBNAIL_SIZE = (320, 480)
+UNFINISHED_STATUSES = ["pending", "processing"]
+LEASE_ID = "retention"
+INTERRUPTED_MESSAGE = "Traitement interrompu"
+
+
+class LeaseLost(Exception):
+    """Un autre worker a repris le bail : la passe en cours s'arrête"""
+
+
+def make_thumbnail(image_base64: str) -> str:
+    image = Image.open(io.BytesIO(base64.b64decode(image_base64))).convert("RGB")
+    image.thumbnail(THUMBNAIL_SIZE)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+class RetentionMetrics:
+    def __init__(self):
+        self.runs = 0
+        self.last_run_at = None
+        self.batches_deleted = 0
+        self.batches_interrupted = 0
+        self.pages_deleted = 0
+        self.translated_pages_deleted = 0
+        self.pages_thumbnailed = 0
+        self.reclaimed_bytes = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class RetentionTask:
+    def __init__(self, db):
+        self.db = db
+        self.metrics = RetentionMetrics()
+        self._task = None
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def start(self):
+        if RETENTION_ENABLED:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except LeaseLost:
+                logger.warning("Bail de rétention perdu, passe interrompue")
+            except Exception as e:
+                logger.error(f"Erreur de rétention: {e}")
+            await asyncio.sleep(INTERVAL_SECONDS)
+
+    async def _renew_lease(self) -> bool:
+        """Prend ou prolonge le bail ; False s'il est tenu par un autre worker"""
+        now = datetime.utcnow()
+        try:
+            await self.db.retention_state.find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Document présent mais bail valide d'un autre worker : l'upsert a tenté une insertion
+            return False
+        return True
+
+    async def _pause(self):
+        """Pause entre deux lots ; le bail est renouvelé pour le lot suivant"""
+        await asyncio.sleep(CHUNK_PAUSE_SECONDS)
+        if not await self._renew_lease():
+            raise LeaseLost()
+
+    async def run_once(self):
+        if not await self._renew_lease():
+            return
+        now = datetime.utcnow()
+        if UNFINISHED_TTL_HOURS:
+            await self.expire_unfinished(now - timedelta(hours=UNFINISHED_TTL_HOURS))
+        if MAX_BATCHES_PER_USER:
+            await self.enforce_quota(MAX_BATCHES_PER_USER)
+        if THUMBNAIL_AFTER_DAYS:
+            await self.compact_originals(now - timedelta(days=THUMBNAIL_AFTER_DAYS))
+        self.metrics.runs += 1
+        self.metrics.last_run_at = now
+        logger.info(f"Rétention : {self.metrics.as_dict()}")
+
+    async def expire_unfinished(self, cutoff: datetime):
+        # Batches interrompus : clôturés sans supprimer les pages déjà traduites
+        interrupted = {"status": {"$in": UNFINISHED_STATUSES}, "created_at": {"$lt": cutoff}}
+        while True:
+            batch_ids = [b["_id"] async for b in self.db.batches.find(interrupted, {"_id": 1}).limit(CHUNK_SIZE)]
+            if not batch_ids:
+                break
+            for batch_id in batch_ids:
+                await self._close_interrupted(batch_id)
+            await self._pause()
+
+        # Batches en échec (aucune page traduite) : index partiel, seuls eux y figurent
+        failed = {"status": "completed", "pages_done": 0, "created_at": {"$lt": cutoff}}
+        while True:
+            batch_ids = [b["_id"] async for b in self.db.batches.find(
+                failed, {"_id": 1}
+            ).hint([("created_at", ASCENDING)]).limit(CHUNK_SIZE)]
+            if not batch_ids:
+                break
+            await self.delete_batches(batch_ids)
+            await self._pause()
+
+    async def _close_interrupted(self, batch_id: str):
+        await self.db.pages.update_many(
+            {"batch_id": batch_id, "status": {"$in": UNFINISHED_STATUSES}},
+            {"$set": {"status": "error", "error_message": INTERRUPTED_MESSAGE}},
+        )
+        pages_done = await self.db.pages.count_documents({"batch_id": batch_id, "status": "done"})
+        pages_failed = await self.db.pages.count_documents({"batch_id": batch_id, "status": "error"})
+        await self.db.batches.update_one({"_id": batch_id}, {"$set": {
+            "status": "completed",
+            "pages_done": pages_done,
+            "pages_failed": pages_failed,
+            "error_message": INTERRUPTED_MESSAGE,
+        }})
+        self.metrics.batches_interrupted += 1
+
+    async def enforce_quota(self, max_batches: int):
+        # Utilisateurs parcourus un à un dans l'ordre de l'index (user_id, created_at) :
+        # un saut d'index par utilisateur plutôt qu'un $group sur toute la collection
+        last_user_id = MinKey()
+        users_seen = 0
+        while True:
+            row = await self.db.batches.find_one(
+                {"user_id": {"$gt": last_user_id}}, {"_id": 0, "user_id": 1}, sort=[("user_id", ASCENDING)]
+            )
+            if row is None:
+                break
+            last_user_id = row["user_id"]
+            while True:
+                # Au-delà des max_batches plus récents
+                batch_ids = [b["_id"] async for b in self.db.batches.find(
+                    {"user_id": last_user_id}, {"_id": 1}
+                ).sort("created_at", -1).skip(max_batches).limit(CHUNK_SIZE)]
+                if not batch_ids:
+                    break
+                await self.delete_batches(batch_ids)
+                await self._pause()
+            users_seen += 1
+            if users_seen % CHUNK_SIZE == 0:
+                await self._pause()
+
+    async def delete_batches(self, batch_ids: List[str]):
+        for collection, counter in (("pages", "pages_deleted"), ("translated_pages", "translated_pages_deleted")):
+            self.metrics.reclaimed_bytes += await self._estimated_size(collection, {"batch_id": {"$in": batch_ids}})
+            result = await self.db[collection].delete_many({"batch_id": {"$in": batch_ids}})
+            setattr(self.metrics, counter, getattr(self.metrics, counter) + result.deleted_count)
+        result = await self.db.batches.delete_many({"_id": {"$in": batch_ids}})
+        self.metrics.batches_deleted += result.deleted_count
+
+    async def _estimated_size(self, collection: str, query: dict) -> int:
+        """Nombre de documents visés (compté sur l'index batch_id) x taille moyenne de la collection.
+
+        Mesurer chaque document chargerait ses images base64 en cache juste avant sa suppression.
+        """
+        count = await self.db[collection].count_documents(query)
+        if not count:
+            return 0
+        stats = await self.db.command("collStats", collection)
+        return count * int(stats.get("avgObjSize", 0))
+
+    async def compact_originals(self, cutoff: datetime):
+        # Reprise après le dernier batch compacté (curseur created_at) : une passe ne relit
+        # pas les batches déjà compactés, seuls ceux à égalité de created_at sont revus.
+        # Un batch plus vieux que le curseur est forcément clos : cutoff (jours) dépasse le
+        # TTL des batches interrompus (heures)
+        state = await self.db.retention_state.find_one({"_id": LEASE_ID}, {"compacted_until": 1})
+        watermark = (state or {}).get("compacted_until", datetime.min)
+        while True:
+            query = {"status": "completed", "created_at": {"$gte": watermark, "$lt": cutoff},
+                     "originals_compacted": {"$ne": True}}
+            batches = [b async for b in self.db.batches.find(
+                query, {"pages_ids": 1, "created_at": 1}
+            ).sort("created_at", ASCENDING).limit(CHUNK_SIZE)]
+            if not batches:
+                break
+            for batch in batches:
+                await self._compact_batch(batch)
+            watermark = batches[-1]["created_at"]
+            await self.db.retention_state.update_one({"_id": LEASE_ID}, {"$set": {"compacted_until": watermark}})
+            await self._pause()
+
+    async def _compact_batch(self, batch: dict):
+        page_updates = []
+        translated_updates = []
+        cursor = self.db.pages.find({"_id": {"$in": batch.get("pages_ids", [])}}, {"original_image": 1})
+        async for page in cursor:
+            original = page.get("original_image")
+            if not original:
+                continue
+            try:
+                # Décodage et redimensionnement hors de la boucle d'événements
+                thumbnail = await asyncio.to_thread(make_thumbnail, original)
+            except Exception as e:
+                logger.warning(f"Vignette impossible pour la page {page['_id']}: {e}")
+                continue
+            if len(thumbnail) >= len(original):
+                continue
+            fields = {"original_image": thumbnail, "original_url": f"data:image/jpeg;base64,{thumbnail}"}
+            page_updates.append(UpdateOne({"_id": page["_id"]}, {"$set": fields}))
+            translated_updates.append(UpdateOne({"page_id": page["_id"]}, {"$set": fields}))
+            # Estimation : original_image et original_url portent l'image, dans pages et translated_pages
+            self.metrics.reclaimed_bytes += 4 * (len(original) - len(thumbnail))
+            self.metrics.pages_thumbnailed += 1
+
+        if page_updates:
+            await self.db.pages.bulk_write(page_updates, ordered=False)
+            await self.db.translated_pages.bulk_write(translated_updates, ordered=False)
+        await self.db.batches.update_one({"_id": batch["_id"]}, {"$set": {"originals_compacted": True}})
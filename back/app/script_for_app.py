@@ -9,9 +9,11 @@ from ultralytics.nn.tasks import DetectionModel
 # Correction : retirer C3k de l'import (il n'existe pas dans ultralytics.nn.modules.block)
 from ultralytics.nn.modules.block import C3k2
 import pytesseract
-from transformers import MarianTokenizer, MarianMTModel
 import string
 import textwrap
+from app.decoding import generation_kwargs
+from app.model_pool import translation_pool, DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG
+from app.languages import UNSPACED_LANGUAGES, tesseract_language
 
 # Charger le modèle de manière dynamique
 def find_model_path():
@@ -60,10 +62,6 @@ def yolo_prediction_to_yolo_format(results, image_size):#ce print pour debug
         yolo_boxes.append((x_center.item(), y_center.item(), box_width.item(), box_height.item()))
     return yolo_boxes
 
-model_name = 'Helsinki-NLP/opus-mt-en-fr'
-tokenizer = MarianTokenizer.from_pretrained(model_name)
-translation_model = MarianMTModel.from_pretrained(model_name)
-
 def yolo_to_pixel(box, img_width, img_height):
     x_center, y_center, w, h = box
     x_center *= img_width
@@ -83,17 +81,32 @@ def yolo_to_pixel(box, img_width, img_height):
     return (left, top, right, bottom)
 
 
-def clean_text(region):
-    text = pytesseract.image_to_string(region).strip()
+def clean_text(region, source_lang=DEFAULT_SOURCE_LANG):
+    text = pytesseract.image_to_string(region, lang=tesseract_language(source_lang)).strip()
+    if source_lang in UNSPACED_LANGUAGES:
+        # Japonais : lignes recollées sans espace, ponctuation pleine chasse conservée pour Marian
+        return "".join(text.split())
     text = text.replace('\n', ' ').replace('\t', ' ').replace('- ', '-')
     punct_to_remove = string.punctuation.replace("'", "")
     translator = str.maketrans('', '', punct_to_remove)
     cleaned_text = text.translate(translator).lower()
     return cleaned_text
 
-def extract_and_translate(image, yolo_boxes):
+def translate_texts(texts, decoding_profile=None, source_lang=DEFAULT_SOURCE_LANG, target_lang=DEFAULT_TARGET_LANG):
+    """Traduit toutes les bulles d'une page en un seul appel generate()"""
+    if not texts:
+        return []
+    tokenizer, translation_model = translation_pool.get(source_lang, target_lang)
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+    input_length = inputs["input_ids"].shape[1]
+    output = translation_model.generate(**inputs, **generation_kwargs(decoding_profile, input_length))
+    return tokenizer.batch_decode(output, skip_special_tokens=True)
+
+def extract_and_translate(image, yolo_boxes, decoding_profile=None,
+                          source_lang=DEFAULT_SOURCE_LANG, target_lang=DEFAULT_TARGET_LANG):
     width, height = image.size
-    results = []
+    boxes = []
+    texts = []
 
     for box in yolo_boxes:
         pixel_box = yolo_to_pixel(box, width, height)
@@ -101,17 +114,12 @@ def extract_and_translate(image, yolo_boxes):
             continue
         
         region = image.crop(pixel_box)
-        text = clean_text(region)
-
-        if text:
-            inputs = tokenizer(text, return_tensors="pt", truncation=True)
-            output = translation_model.generate(**inputs)
-            french = tokenizer.decode(output[0], skip_special_tokens=True)
-            results.append((pixel_box, french))
-        else:
-            results.append((pixel_box, ""))
+        boxes.append(pixel_box)
+        texts.append(clean_text(region, source_lang))
 
-    return results
+    to_translate = [text for text in texts if text]
+    translated = iter(translate_texts(to_translate, decoding_profile, source_lang, target_lang))
+    return [(box, next(translated) if text else "") for box, text in zip(boxes, texts)]
 
 def draw_wrapped_text(draw, box, text, font):
     left, top, right, bottom = box
@@ -147,7 +155,8 @@ def draw_translations(image, translations, font_path=None):
 
 
 
-def process_image(input_image: Image.Image) -> Image.Image:
+def process_image(input_image: Image.Image, decoding_profile=None,
+                  source_lang=DEFAULT_SOURCE_LANG, target_lang=DEFAULT_TARGET_LANG) -> Image.Image:
     if yolo_model is None:
         print("Model not available, returning original image")
         return input_image    
@@ -157,7 +166,7 @@ def process_image(input_image: Image.Image) -> Image.Image:
         print(f"Nombre de boxes détectées : {len(results.boxes)}")  
         yolo_boxes = yolo_prediction_to_yolo_format(results, input_image.size)
         print(f"Boîtes YOLO converties : {yolo_boxes}")  # Debug print
-        translations = extract_and_translate(input_image, yolo_boxes)
+        translations = extract_and_translate(input_image, yolo_boxes, decoding_profile, source_lang, target_lang)
         print(f"Traductions extraites : {translations}")  # Debug print
         final_image = draw_translations(input_image, translations)
         print("Image traitée avec succès.")
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+# Sans événement pendant ce délai, le flux relit pages et batch dans Mongo
+# (événements publiés par un autre worker, traitement interrompu) et, en SSE,
+# envoie un commentaire pour que les proxies ne coupent pas la connexion
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "5"))
+FINISHED_STATUSES = ("done", "error")
+
+
+def page_image_url(page_id: str, pseudo: Optional[str] = None) -> str:
+    # Le pseudo en paramètre permet d'utiliser l'URL directement dans un <img>
+    url = f"/page/{page_id}/translated.png"
+    return f"{url}?pseudo={quote(pseudo)}" if pseudo else url
+
+
+def page_payload(page_id: str, batch_id: str, filename: str, status: str, error_message=None,
+                 pseudo: Optional[str] = None) -> dict:
+    payload = {"type": "page", "page_id": page_id, "batch_id": batch_id,
+               "filename": filename, "status": status}
+    if status == "done":
+        payload["image_url"] = page_image_url(page_id, pseudo)
+    if error_message:
+        payload["error_message"] = error_message
+    return payload
+
+
+def encode_message(payload: dict, fmt: str) -> bytes:
+    data = json.dumps(payload, default=str)
+    if fmt == "sse":
+        return f"event: {payload['type']}\ndata: {data}\n\n".encode("utf-8")
+    return (data + "\n").encode("utf-8")
+
+
+async def stream_batch_pages(db, broker, batch_id: str, fmt: str,
+                             pseudo: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Envoie les pages déjà terminées du batch, puis chaque page dès qu'elle se termine.
+
+    L'abonnement au broker est ouvert avant la lecture initiale pour ne perdre
+    aucune page entre les deux. Le flux se ferme quand le batch est `completed`
+    ou n'existe plus (purgé par la rétention).
+    """
+    sent = set()
+
+    async def finished_pages():
+        cursor = db.pages.find(
+            {"batch_id": batch_id, "status": {"$in": list(FINISHED_STATUSES)}},
+            {"filename": 1, "status": 1, "error_message": 1},
+        )
+        async for page in cursor:
+            if page["_id"] in sent:
+                continue
+            sent.add(page["_id"])
+            yield encode_message(page_payload(page["_id"], batch_id, page["filename"],
+                                              page["status"], page.get("error_message"), pseudo), fmt)
+
+    async def batch_completed():
+        batch = await db.batches.find_one({"_id": batch_id}, {"status": 1})
+        return not batch or batch.get("status") == "completed"
+
+    async with broker.subscribe() as events:
+        async for message in finished_pages():
+            yield message
+
+        completed = await batch_completed()
+        while not completed:
+            try:
+                event = await asyncio.wait_for(events.__anext__(), timeout=STREAM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                if fmt == "sse":
+                    yield b": keepalive\n\n"
+                async for message in finished_pages():
+                    yield message
+                completed = await batch_completed()
+                continue
+            if event["batch_id"] != batch_id:
+                continue
+            if event["type"] == "batch":
+                completed = event["status"] == "completed"
+            elif event["status"] in FINISHED_STATUSES and event["page_id"] not in sent:
+                sent.add(event["page_id"])
+                yield encode_message(page_payload(event["page_id"], batch_id, event["filename"],
+                                                  event["status"], event.get("error_message"), pseudo), fmt)
+
+    # Rattrapage des pages dont l'événement aurait précédé l'abonnement
+    async for message in finished_pages():
+        yield message
+    yield encode_message({"type": "batch", "batch_id": batch_id, "status": "completed"}, fmt)
@@ -0,0 +1,138 @@
+"""Répartition des cœurs CPU entre workers uvicorn, workers de traitement et étapes.
+
+Sans budget, chaque processus lance PyTorch (YOLO, Marian) avec autant de
+threads que de cœurs et chaque appel pytesseract démarre un tesseract avec ses
+propres threads OpenMP : à plusieurs workers la machine est sursouscrite.
+
+Variables d'environnement :
+    WEB_CONCURRENCY      nombre de workers uvicorn (défaut 1)
+    PROCESSING_WORKERS   processus de traitement par worker uvicorn (défaut 1)
+    TORCH_THREADS        threads intra-op torch par processus de traitement (défaut : part des cœurs)
+    TESSERACT_THREADS    threads OpenMP par appel tesseract (défaut 1)
+    CPU_AFFINITY         "1" pour épingler chaque processus de traitement sur ses cœurs
+    API_WORKER_INDEX     rang du worker uvicorn (défaut : premier rang libre, réservé
+                         par verrou de fichier dans CPU_SLOT_DIR, défaut /tmp/scantrad-cpu-slots)
+"""
+import logging
+import os
+import tempfile
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : pas de verrou de fichier, rang 0 par défaut
+    fcntl = None
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def available_cores() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    def __init__(self, cores: List[int], api_workers: int = 1, processing_workers: int = 1,
+                 threads_per_worker: Optional[int] = None, tesseract_threads: int = 1,
+                 affinity: bool = False):
+        self.cores = cores
+        self.api_workers = max(1, api_workers)
+        self.processing_workers = max(1, processing_workers)
+        self.cores_per_api_worker = max(1, len(cores) // self.api_workers)
+        self.threads_per_worker = threads_per_worker or max(1, self.cores_per_api_worker // self.processing_workers)
+        # Rang du worker uvicorn propriétaire du pool, fixé par claim_api_worker_slot()
+        self.api_index = 0
+        self.torch_threads = self.threads_per_worker
+        self.tesseract_threads = max(1, min(tesseract_threads, self.threads_per_worker))
+        self.affinity = affinity
+
+    def worker_cores(self, worker_index: int) -> List[int]:
+        """Cœurs réservés au processus de traitement n° worker_index du worker uvicorn api_index"""
+        start = (self.api_index * self.cores_per_api_worker + worker_index * self.threads_per_worker) % len(self.cores)
+        return [self.cores[(start + i) % len(self.cores)] for i in range(self.threads_per_worker)]
+
+    def describe(self) -> dict:
+        return {
+            "cores": len(self.cores),
+            "api_workers": self.api_workers,
+            "api_index": self.api_index,
+            "processing_workers": self.processing_workers,
+            "torch_threads": self.torch_threads,
+            "tesseract_threads": self.tesseract_threads,
+            "affinity": self.affinity,
+        }
+
+
+def load_budget() -> ThreadBudget:
+    torch_threads = os.getenv("TORCH_THREADS")
+    return ThreadBudget(
+        cores=available_cores(),
+        api_workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        processing_workers=int(os.getenv("PROCESSING_WORKERS", "1")),
+        threads_per_worker=int(torch_threads) if torch_threads else None,
+        tesseract_threads=int(os.getenv("TESSERACT_THREADS", "1")),
+        affinity=os.getenv("CPU_AFFINITY", "0") == "1",
+    )
+
+
+thread_budget = load_budget()
+
+CPU_SLOT_DIR = os.getenv("CPU_SLOT_DIR", os.path.join(tempfile.gettempdir(), "scantrad-cpu-slots"))
+# Verrou gardé ouvert jusqu'à la fin du processus (libéré par le système à sa mort)
+_api_slot_file = None
+
+
+def claim_api_worker_slot(budget: ThreadBudget = thread_budget) -> int:
+    """Attribue au worker uvicorn courant un rang distinct parmi api_workers.
+
+    Chaque worker a son propre pool de traitement : sans rang distinct, tous
+    épingleraient leurs processus sur les mêmes premiers cœurs.
+    """
+    global _api_slot_file
+    explicit = os.getenv("API_WORKER_INDEX")
+    if explicit is not None:
+        budget.api_index = int(explicit) % budget.api_workers
+    elif budget.api_workers > 1 and fcntl is not None and _api_slot_file is None:
+        os.makedirs(CPU_SLOT_DIR, exist_ok=True)
+        for index in range(budget.api_workers):
+            slot_file = open(os.path.join(CPU_SLOT_DIR, f"api-{index}.lock"), "w")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                slot_file.close()
+                continue
+            _api_slot_file = slot_file
+            budget.api_index = index
+            break
+        else:
+            budget.api_index = os.getpid() % budget.api_workers
+            logger.warning(f"Aucun rang CPU libre dans {CPU_SLOT_DIR}, rang {budget.api_index} partagé")
+    return budget.api_index
+
+
+def apply_thread_budget(budget: ThreadBudget = thread_budget, worker_index: Optional[int] = None):
+    """Applique le budget au processus courant, à appeler avant de charger les modèles"""
+    # Lu par les runtimes OpenMP/MKL au chargement de torch
+    os.environ["OMP_NUM_THREADS"] = str(budget.torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(budget.torch_threads)
+    try:
+        import torch
+    except ImportError:
+        # Backends de test sans torch (harnais de charge)
+        torch = None
+    if torch is not None:
+        torch.set_num_threads(budget.torch_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Déjà fixé : torch a exécuté du travail parallèle dans ce processus
+            pass
+    # Positionné après l'import de torch : ne borne que les tesseract lancés par pytesseract
+    os.environ["OMP_THREAD_LIMIT"] = str(budget.tesseract_threads)
+
+    if budget.affinity and worker_index is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, budget.worker_cores(worker_index))
+    logger.info(f"Budget CPU appliqué (worker {worker_index}): {budget.describe()}")
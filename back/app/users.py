@@ -0,0 +1,80 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+
+class UserCache:
+    """Cache LRU borné avec expiration : pseudo -> user_id"""
+
+    def __init__(self, max_size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, pseudo: str) -> Optional[str]:
+        entry = self._entries.get(pseudo)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[pseudo]
+            return None
+        self._entries.move_to_end(pseudo)
+        return user_id
+
+    def set(self, pseudo: str, user_id: str):
+        self._entries[pseudo] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(pseudo)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+async def resolve_user(users_collection, pseudo: str) -> dict:
+    """Retourne l'utilisateur, créé au besoin par un upsert atomique.
+
+    Deux premières connexions simultanées ne peuvent plus se marcher dessus :
+    find_one_and_update avec upsert=True s'appuie sur l'index unique de pseudo.
+    """
+    user_id = user_cache.get(pseudo)
+    if user_id:
+        return {"_id": user_id, "pseudo": pseudo}
+
+    try:
+        user = await users_collection.find_one_and_update(
+            {"pseudo": pseudo},
+            {"$setOnInsert": {"_id": str(uuid.uuid4()), "created_at": datetime.utcnow()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Mongo < 4.2 ne rejoue pas l'upsert perdant : l'utilisateur existe forcément
+        user = await users_collection.find_one({"pseudo": pseudo})
+    user_cache.set(pseudo, user["_id"])
+    return user
+
+
+async def find_user(users_collection, pseudo: str) -> Optional[dict]:
+    """Retourne l'utilisateur s'il existe déjà, sans le créer"""
+    user_id = user_cache.get(pseudo)
+    if user_id:
+        return {"_id": user_id, "pseudo": pseudo}
+
+    user = await users_collection.find_one({"pseudo": pseudo}, {"pseudo": 1})
+    if user:
+        user_cache.set(pseudo, user["_id"])
+    return user
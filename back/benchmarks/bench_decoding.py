@@ -0,0 +1,90 @@
+"""Compare les profils de décodage Marian sur le texte OCR de data/test/images.
+
+Les bulles sont découpées avec les labels de vérité terrain puis passées à
+Tesseract ; chaque profil traduit ensuite les mêmes pages, comme l'application :
+toutes les bulles d'une page en un appel translate_texts (padding et
+max_new_tokens selon l'entrée la plus longue). On mesure les tokens de sortie
+par seconde et, si sacrebleu est installé, le BLEU/chrF de
+chaque profil par rapport au profil "quality" (parité de sortie).
+
+Usage (depuis back/) :
+    python -m benchmarks.bench_decoding --limit 20
+"""
+import argparse
+import time
+
+from PIL import Image
+
+from app.decoding import DECODING_PROFILES
+from app.model_pool import translation_pool
+from app.script_for_app import clean_text, translate_texts, yolo_to_pixel
+from benchmarks.dataset import iter_labelled_images
+
+try:
+    import sacrebleu
+except ImportError:
+    sacrebleu = None
+
+REFERENCE_PROFILE = "quality"
+
+
+def collect_pages(limit):
+    """Textes OCR des bulles, regroupés par page"""
+    pages = []
+    for image_path, boxes in iter_labelled_images("test", limit):
+        image = Image.open(image_path).convert("RGB")
+        width, height = image.size
+        texts = []
+        for box in boxes:
+            pixel_box = yolo_to_pixel(box, width, height)
+            if pixel_box is None:
+                continue
+            text = clean_text(image.crop(pixel_box))
+            if text:
+                texts.append(text)
+        if texts:
+            pages.append(texts)
+    return pages
+
+
+def translate(pages, profile):
+    tokenizer, _ = translation_pool.get()
+    outputs = []
+    start = time.perf_counter()
+    for texts in pages:
+        outputs.extend(translate_texts(texts, profile))
+    elapsed = time.perf_counter() - start
+    generated_tokens = sum(len(tokenizer.tokenize(output)) for output in outputs)
+    return outputs, generated_tokens, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None, help="nombre max d'images de data/test")
+    args = parser.parse_args()
+
+    pages = collect_pages(args.limit)
+    bubbles = sum(len(texts) for texts in pages)
+    print(f"{bubbles} bulles OCR sur {len(pages)} pages")
+    if not pages:
+        return
+
+    # Chargement du modèle hors mesure
+    translation_pool.get()
+    results = {profile: translate(pages, profile) for profile in DECODING_PROFILES}
+    references = results[REFERENCE_PROFILE][0]
+    if sacrebleu is None:
+        print("sacrebleu non installé : pas de contrôle BLEU/chrF")
+
+    for profile, (outputs, tokens, elapsed) in results.items():
+        line = (f"{profile:<9} {tokens / elapsed:8.1f} tokens/s  "
+                f"{elapsed / bubbles * 1000:7.1f} ms/bulle  {elapsed / len(pages) * 1000:7.1f} ms/page")
+        if sacrebleu is not None:
+            bleu = sacrebleu.corpus_bleu(outputs, [references]).score
+            chrf = sacrebleu.corpus_chrf(outputs, [references]).score
+            line += f"  BLEU={bleu:5.1f} chrF={chrf:5.1f} (vs {REFERENCE_PROFILE})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compte les allers-retours Mongo et le temps d'écriture d'un batch de 100 pages.
+
+Compare l'ancien schéma d'écriture (insert_one / find_one / update_one par page)
+au schéma groupé (insert_many + BulkWriter) de app.main.transform_processing :
+un bulk_write par page (fin de la page et passage de la suivante en processing)
+et les insertions de translated_pages regroupées par le timer du BulkWriter.
+Chaque page simule une durée de traitement (--page-latency-ms) pour que les
+flush du timer tombent comme en production.
+
+Usage (depuis back/, avec un Mongo local) :
+    MONGO_URL=mongodb://localhost:27018 python -m benchmarks.bench_mongo_writes --pages 100
+"""
+import argparse
+import asyncio
+import base64
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne, monitoring
+
+from app.persistence import BulkWriter
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.commands.clear()
+
+
+def make_pages(batch_id, count, image_size):
+    pages = []
+    for i in range(count):
+        image = base64.b64encode(os.urandom(image_size)).decode("utf-8")
+        page_id = str(uuid.uuid4())
+        pages.append({
+            "_id": page_id, "page_id": page_id, "batch_id": batch_id,
+            "filename": f"page_{i:03d}.jpg", "status": "pending",
+            "original_image": image, "translated_image": None,
+            "original_url": f"data:image/jpeg;base64,{image}", "translated_url": None,
+        })
+    return pages
+
+
+def translated_doc(page, user_id, batch_id):
+    return {
+        "_id": str(uuid.uuid4()), "page_id": page["_id"], "user_id": user_id,
+        "batch_id": batch_id, "filename": page["filename"],
+        "original_image": page["original_image"], "translated_image": page["original_image"],
+        "original_url": page["original_url"], "translated_url": page["original_url"],
+        "translation_completed_at": datetime.utcnow(), "processing_time_seconds": 0,
+    }
+
+
+async def legacy_writes(db, user_id, pages, page_latency):
+    batch_id = pages[0]["batch_id"]
+    for page in pages:
+        await db.pages.insert_one(dict(page))
+    await db.batches.insert_one({"_id": batch_id, "user_id": user_id, "pages_ids": [p["_id"] for p in pages],
+                                 "created_at": datetime.utcnow(), "status": "processing"})
+    await db.batches.find_one({"_id": batch_id})
+    for page in pages:
+        stored = await db.pages.find_one({"_id": page["_id"]})
+        await db.pages.update_one({"_id": page["_id"]}, {"$set": {"status": "processing"}})
+        await asyncio.sleep(page_latency)
+        await db.pages.update_one({"_id": page["_id"]}, {"$set": {
+            "status": "done", "translated_image": stored["original_image"], "translated_url": stored["original_url"]}})
+        await db.translated_pages.insert_one(translated_doc(stored, user_id, batch_id))
+    await db.batches.update_one({"_id": batch_id}, {"$set": {"status": "completed"}})
+
+
+async def bulk_writes(db, user_id, pages, page_latency):
+    batch_id = pages[0]["batch_id"]
+    await db.pages.insert_many([dict(p) for p in pages], ordered=True)
+    await db.batches.insert_one({"_id": batch_id, "user_id": user_id, "pages_ids": [p["_id"] for p in pages],
+                                 "created_at": datetime.utcnow(), "status": "processing"})
+    pages_writer = BulkWriter(db.pages)
+    translated_writer = BulkWriter(db.translated_pages)
+    for index, page in enumerate(pages):
+        if index == 0:
+            await pages_writer.add(UpdateOne({"_id": page["_id"]}, {"$set": {"status": "processing"}}))
+        await asyncio.sleep(page_latency)
+        await pages_writer.add(UpdateOne({"_id": page["_id"]}, {"$set": {
+            "status": "done", "translated_image": page["original_image"], "translated_url": page["original_url"]}}))
+        await translated_writer.add(InsertOne(translated_doc(page, user_id, batch_id)))
+        if index + 1 < len(pages):
+            await pages_writer.add(UpdateOne({"_id": pages[index + 1]["_id"]}, {"$set": {"status": "processing"}}))
+        await pages_writer.flush()
+    await pages_writer.close()
+    await translated_writer.close()
+    await db.batches.update_one({"_id": batch_id}, {"$set": {"status": "completed"}})
+
+
+async def run(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(args.mongo_url, event_listeners=[counter])
+    db = client[args.database]
+    try:
+        for name, scenario in (("legacy", legacy_writes), ("bulk", bulk_writes)):
+            for collection in ("pages", "batches", "translated_pages"):
+                await db[collection].delete_many({})
+            pages = make_pages(str(uuid.uuid4()), args.pages, args.image_size)
+            counter.reset()
+            start = time.perf_counter()
+            await scenario(db, "bench-user", pages, args.page_latency_ms / 1000)
+            elapsed = time.perf_counter() - start
+            total = sum(counter.commands.values())
+            detail = ", ".join(f"{cmd}={n}" for cmd, n in sorted(counter.commands.items()))
+            print(f"{name:<7} {args.pages} pages : {total} allers-retours ({detail}) en {elapsed:.3f}s")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27018"))
+    parser.add_argument("--database", default="scantrad_bench")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--page-latency-ms", type=float, default=200, help="durée simulée du traitement d'une page")
+    parser.add_argument("--image-size", type=int, default=64 * 1024, help="taille brute d'une page en octets")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
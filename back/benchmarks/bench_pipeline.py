@@ -0,0 +1,188 @@
+"""Benchmarks par étape du pipeline sur le jeu de données embarqué (data/).
+
+Étapes mesurées sur chaque image : décodage, détection YOLO, yolo_to_pixel,
+OCR clean_text, traduction Marian, draw_translations, encodage PNG, puis le
+chemin complet process_image. Rapporte images/s, percentiles par étape, pic
+mémoire et le rappel de détection contre les labels de vérité terrain, pour
+qu'une optimisation de vitesse ne dégrade pas la sortie sans qu'on le voie.
+
+Les temps sont mesurés sans tracemalloc, dont le surcoût à chaque allocation
+fausserait les percentiles ; le pic du tas Python est mesuré dans une passe
+séparée, non chronométrée, sur les premières images.
+
+Les résultats sont écrits en JSON pour comparaison entre commits.
+
+Usage (depuis back/) :
+    python -m benchmarks.bench_pipeline --split test --output bench_pipeline.json
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+from PIL import Image
+
+from app.script_for_app import (
+    clean_text, draw_translations, process_image, translate_texts,
+    yolo_model, yolo_prediction_to_yolo_format, yolo_to_pixel,
+)
+from benchmarks.dataset import iter_labelled_images
+
+STAGES = ["decode", "detect", "yolo_to_pixel", "ocr", "translate", "draw", "encode", "end_to_end"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def iou(a, b):
+    left, top = max(a[0], b[0]), max(a[1], b[1])
+    right, bottom = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def matched_boxes(truth, detected, threshold):
+    """Nombre de boîtes de vérité terrain appariées (glouton, une détection par boîte)"""
+    remaining = list(detected)
+    matched = 0
+    for box in truth:
+        best = max(remaining, key=lambda d: iou(box, d), default=None)
+        if best is not None and iou(box, best) >= threshold:
+            remaining.remove(best)
+            matched += 1
+    return matched
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def heap_peak(args):
+    """Pic du tas Python de process_image, hors de la passe chronométrée"""
+    tracemalloc.start()
+    try:
+        for image_path, _ in iter_labelled_images(args.split, args.heap_images):
+            image = Image.open(io.BytesIO(image_path.read_bytes())).convert("RGB")
+            process_image(image, args.profile)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(args):
+    timings = defaultdict(list)
+    truth_total = 0
+    truth_matched = 0
+    images = 0
+
+    def timed(stage, fn, *fn_args):
+        start = time.perf_counter()
+        result = fn(*fn_args)
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    wall_start = time.perf_counter()
+    for image_path, truth in iter_labelled_images(args.split, args.limit):
+        raw = image_path.read_bytes()
+        image = timed("decode", lambda: Image.open(io.BytesIO(raw)).convert("RGB"))
+        width, height = image.size
+
+        detections = timed("detect", lambda: yolo_model(image, verbose=False)[0])
+        yolo_boxes = yolo_prediction_to_yolo_format(detections, image.size)
+        pixel_boxes = timed("yolo_to_pixel", lambda: [b for b in (yolo_to_pixel(box, width, height)
+                                                                  for box in yolo_boxes) if b])
+
+        truth_pixels = [b for b in (yolo_to_pixel(box, width, height) for box in truth) if b]
+        truth_total += len(truth_pixels)
+        truth_matched += matched_boxes(truth_pixels, pixel_boxes, args.iou)
+
+        texts = timed("ocr", lambda: [clean_text(image.crop(box)) for box in pixel_boxes])
+        to_translate = [text for text in texts if text]
+        translated = iter(timed("translate", translate_texts, to_translate, args.profile))
+        translations = [(box, next(translated) if text else "") for box, text in zip(pixel_boxes, texts)]
+        drawn = timed("draw", draw_translations, image.copy(), translations)
+
+        def encode():
+            buffer = io.BytesIO()
+            drawn.save(buffer, format="PNG")
+            return buffer.getvalue()
+        timed("encode", encode)
+
+        fresh = Image.open(io.BytesIO(raw)).convert("RGB")
+        timed("end_to_end", process_image, fresh, args.profile)
+        images += 1
+
+    wall = time.perf_counter() - wall_start
+    peak_traced = heap_peak(args) if args.heap_images else None
+
+    end_to_end = sum(timings["end_to_end"])
+    return {
+        "commit": git_commit(),
+        "date": datetime.utcnow().isoformat(),
+        "split": args.split,
+        "decoding_profile": args.profile,
+        "images": images,
+        "wall_seconds": round(wall, 3),
+        "images_per_second": round(images / end_to_end, 3) if end_to_end else 0.0,
+        "stages": {
+            stage: {
+                "count": len(timings[stage]),
+                "total_s": round(sum(timings[stage]), 4),
+                "p50_ms": round(percentile(timings[stage], 50) * 1000, 2),
+                "p90_ms": round(percentile(timings[stage], 90) * 1000, 2),
+                "p99_ms": round(percentile(timings[stage], 99) * 1000, 2),
+            }
+            for stage in STAGES
+        },
+        "memory": {
+            "peak_python_heap_bytes": peak_traced,
+            "heap_images": args.heap_images,
+            # ru_maxrss est en kilo-octets sous Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "detection": {
+            "iou_threshold": args.iou,
+            "ground_truth_boxes": truth_total,
+            "matched": truth_matched,
+            "recall": round(truth_matched / truth_total, 4) if truth_total else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--split", default="test", choices=["train", "test"])
+    parser.add_argument("--limit", type=int, default=None, help="nombre max d'images")
+    parser.add_argument("--profile", default=None, help="profil de décodage (défaut : DECODING_PROFILE)")
+    parser.add_argument("--iou", type=float, default=0.5, help="seuil IoU pour le rappel de détection")
+    parser.add_argument("--heap-images", type=int, default=3,
+                        help="images de la passe de mesure du tas (0 = pas de tracemalloc)")
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    if yolo_model is None:
+        raise SystemExit("Modèle YOLO introuvable (best.pt) : benchmark impossible")
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Matrice pages/seconde selon la répartition workers x threads sur data/test.
+
+Chaque configuration démarre un ProcessingPool avec son propre ThreadBudget,
+traite toutes les images de data/test et mesure le débit. Les configurations
+qui dépassent le nombre de cœurs sont incluses avec --oversubscribe pour
+montrer l'effondrement du débit.
+
+Usage (depuis back/) :
+    python -m benchmarks.bench_threads --workers 1 2 4 --threads 1 2 4
+"""
+import argparse
+import base64
+import multiprocessing
+import time
+
+from app.processing import ProcessingPool, process_page
+from app.thread_budget import ThreadBudget, available_cores
+from benchmarks.dataset import iter_labelled_images
+
+
+def load_pages(limit):
+    pages = []
+    for image_path, _ in iter_labelled_images("test", limit):
+        pages.append(base64.b64encode(image_path.read_bytes()).decode("utf-8"))
+    return pages
+
+
+def warm_up(barrier, page, profile):
+    """Traite une page puis attend les autres workers : chaque worker reçoit exactement un appel"""
+    process_page(page, profile, "en", "fr")
+    barrier.wait()
+
+
+def run_config(pages, cores, workers, threads, tesseract_threads, affinity, profile):
+    budget = ThreadBudget(cores, processing_workers=workers, threads_per_worker=threads,
+                          tesseract_threads=tesseract_threads, affinity=affinity)
+    pool = ProcessingPool(budget)
+    pool.start()
+    try:
+        # Préchauffage hors mesure, avec le profil mesuré : la barrière garantit que
+        # chaque worker a chargé ses modèles avant le départ du chronomètre
+        with multiprocessing.Manager() as manager:
+            barrier = manager.Barrier(workers)
+            for future in [pool.submit_call(warm_up, barrier, pages[0], profile) for _ in range(workers)]:
+                future.result()
+        start = time.perf_counter()
+        for future in [pool.submit(page, profile, "en", "fr") for page in pages]:
+            future.result()
+        return len(pages) / (time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--tesseract-threads", type=int, default=1)
+    parser.add_argument("--profile", default=None, help="profil de décodage (défaut : DECODING_PROFILE)")
+    parser.add_argument("--limit", type=int, default=None, help="nombre max d'images de data/test")
+    parser.add_argument("--affinity", action="store_true", help="épingler chaque worker sur ses cœurs")
+    parser.add_argument("--oversubscribe", action="store_true", help="inclure workers x threads > cœurs")
+    args = parser.parse_args()
+
+    cores = available_cores()
+    pages = load_pages(args.limit)
+    print(f"{len(pages)} pages, {len(cores)} cœurs")
+    print(f"{'workers':>7} {'threads':>7} {'pages/s':>9}")
+    for workers in args.workers:
+        for threads in args.threads:
+            if workers * threads > len(cores) and not args.oversubscribe:
+                continue
+            rate = run_config(pages, cores, workers, threads, args.tesseract_threads, args.affinity, args.profile)
+            print(f"{workers:>7} {threads:>7} {rate:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Régression des plans de requête : aucune requête de l'API ne doit scanner ni trier en mémoire.
+
+Remplit une base jetable d'un Mongo local avec ~100k documents, applique
+app.indexes.ensure_indexes puis lance explain() sur chaque forme de requête
+de app.indexes.QUERY_SHAPES. Échoue (code de sortie 1) si un plan gagnant
+contient un COLLSCAN ou un SORT (tri en mémoire), ce qui garde les endpoints
+de liste en O(taille de page) quand les données grossissent.
+
+Usage (depuis back/) :
+    MONGO_URL=mongodb://localhost:27018 python -m benchmarks.check_query_plans
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.indexes import QUERY_SHAPES, ensure_indexes
+
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+INSERT_CHUNK = 5000
+
+
+def chunked(documents, size=INSERT_CHUNK):
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def seed(db, users, batches_per_user, pages_per_batch):
+    start = datetime.utcnow()
+    await db.users.insert_many([{"_id": f"user-{u}", "pseudo": f"user{u}", "created_at": start}
+                                for u in range(users)])
+
+    def batches():
+        for u in range(users):
+            for b in range(batches_per_user):
+                yield {"_id": f"batch-{u}-{b}", "user_id": f"user-{u}",
+                       "pages_ids": [f"page-{u}-{b}-{p}" for p in range(pages_per_batch)],
+                       "created_at": start - timedelta(minutes=b), "status": "completed"}
+
+    def pages():
+        for u in range(users):
+            for b in range(batches_per_user):
+                for p in range(pages_per_batch):
+                    yield {"_id": f"page-{u}-{b}-{p}", "page_id": f"page-{u}-{b}-{p}",
+                           "batch_id": f"batch-{u}-{b}", "filename": f"{p}.jpg",
+                           "status": "done" if p % 10 else "error"}
+
+    def translated_pages():
+        for page in pages():
+            if page["status"] == "done":
+                user_id = "user-" + page["batch_id"].split("-")[1]
+                yield {"_id": "t-" + page["_id"], "page_id": page["_id"], "user_id": user_id,
+                       "batch_id": page["batch_id"], "filename": page["filename"],
+                       "translation_completed_at": start}
+
+    for name, documents in (("batches", batches()), ("pages", pages()), ("translated_pages", translated_pages())):
+        for chunk in chunked(documents):
+            await db[name].insert_many(chunk, ordered=False)
+
+
+def plan_stages(plan):
+    """Tous les noms d'étapes d'un plan (formats classique et SBE)"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+async def check(db):
+    failures = 0
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query).limit(100)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = set(plan_stages(explain["queryPlanner"]["winningPlan"]))
+        bad = stages & FORBIDDEN_STAGES
+        label = f"{collection}.find({query}){f'.sort({sort})' if sort else ''}"
+        if bad:
+            failures += 1
+            print(f"ÉCHEC {label} : {', '.join(sorted(bad))}")
+        else:
+            print(f"ok    {label} : {', '.join(sorted(stages))}")
+    return failures
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.database]
+    try:
+        await client.drop_database(args.database)
+        await seed(db, args.users, args.batches_per_user, args.pages_per_batch)
+        await ensure_indexes(db)
+        return await check(db)
+    finally:
+        if not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27018"))
+    parser.add_argument("--database", default="scantrad_explain")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--batches-per-user", type=int, default=25)
+    parser.add_argument("--pages-per-batch", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="conserver la base après le test")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
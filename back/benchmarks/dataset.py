@@ -0,0 +1,33 @@
+"""Accès au jeu de données embarqué (data/) pour les benchmarks.
+
+S'appuie sur l'index mappé en mémoire de transformer/herlpers/dataset_index.py :
+les labels ne sont parsés qu'une fois, puis seulement quand ils changent.
+"""
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = PROJECT_ROOT / "data"
+
+if str(PROJECT_ROOT / "transformer") not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT / "transformer"))
+
+from herlpers.dataset_index import DatasetIndex  # noqa: E402
+
+
+def load_index(split: str = "test") -> DatasetIndex:
+    return DatasetIndex.build(str(DATA_DIR / split / "images"), str(DATA_DIR / split / "labels"))
+
+
+def iter_labelled_images(split: str = "test", limit: int = None):
+    """Itère sur (chemin image, boîtes) d'un split de data/, triés par nom"""
+    index = load_index(split)
+    count = min(limit, len(index)) if limit else len(index)
+    for i in range(count):
+        yield Path(index.path(i)), [tuple(box) for box in index.boxes(i).tolist()]
+
+
+def iter_labelled_samples(split: str = "test", prefetch: int = 8):
+    """Itère sur (chemin, image décodée, boîtes) avec décodage anticipé en arrière-plan"""
+    for path, image, boxes in load_index(split).iter_samples(prefetch=prefetch):
+        yield Path(path), image, [tuple(box) for box in boxes.tolist()]
@@ -0,0 +1,46 @@
+"""Faux backends de traitement pour le harnais de charge (sans YOLO, Tesseract ni Marian).
+
+Branchés via PROCESS_IMAGE_BACKEND, ils tournent dans les processus de
+traitement. La latence simulée se règle par variables d'environnement :
+    FAKE_LATENCY_MS   latence moyenne par page (défaut 200)
+    FAKE_JITTER_MS    variation uniforme autour de la moyenne (défaut 50)
+"""
+import os
+import random
+import time
+
+from PIL import ImageDraw
+
+FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "200"))
+FAKE_JITTER_MS = float(os.getenv("FAKE_JITTER_MS", "50"))
+
+
+def _latency_seconds() -> float:
+    jitter = random.uniform(-FAKE_JITTER_MS, FAKE_JITTER_MS)
+    return max(0.0, FAKE_LATENCY_MS + jitter) / 1000
+
+
+def _mark(image):
+    draw = ImageDraw.Draw(image)
+    width, height = image.size
+    draw.rectangle((width // 4, height // 4, width // 2, height // 3), fill="white")
+    return image
+
+
+def sleep_backend(image, decoding_profile=None, source_lang="en", target_lang="fr"):
+    """Simule un modèle qui attend (I/O, GPU) : ne consomme pas de CPU"""
+    time.sleep(_latency_seconds())
+    return _mark(image)
+
+
+def cpu_backend(image, decoding_profile=None, source_lang="en", target_lang="fr"):
+    """Simule un modèle CPU : occupe un cœur pendant la latence"""
+    deadline = time.perf_counter() + _latency_seconds()
+    while time.perf_counter() < deadline:
+        pass
+    return _mark(image)
+
+
+def echo_backend(image, decoding_profile=None, source_lang="en", target_lang="fr"):
+    """Aucune latence : mesure le coût de l'API seule"""
+    return image
@@ -0,0 +1,261 @@
+"""Harnais de charge de bout en bout pour l'API FastAPI (app.main).
+
+Démarre l'API dans un processus uvicorn séparé (loadtest.server), avec un
+Mongo local ou un substitut en mémoire (mongomock-motor) et un faux backend de
+traitement, puis simule des utilisateurs : login, abonnement à /ws, upload
+d'un chapitre, suivi du chapitre sur /batch/{id}/stream jusqu'à sa fin avec
+polling périodique de /result, liste de /user/{pseudo}/batches. Le temps
+upload -> batch completed est rapporté. Rapporte le débit, les latences
+p50/p95/p99 par endpoint et le retard de la boucle d'événements du serveur,
+mesurés sans que le client ne partage le GIL du serveur.
+
+Dépendances du harnais : httpx, websockets (fourni par uvicorn[standard]),
+mongomock-motor pour --mongo memory.
+
+Usage (depuis back/) :
+    python -m loadtest.run --users 20 --pages 5 --backend sleep --latency-ms 200
+    python -m loadtest.run --mongo mongodb://localhost:27018 --backend cpu
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from PIL import Image
+
+BACKENDS = {
+    "sleep": "loadtest.fake_backends:sleep_backend",
+    "cpu": "loadtest.fake_backends:cpu_backend",
+    "echo": "loadtest.fake_backends:echo_backend",
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def configure_environment(args):
+    """Variables lues à l'import par les modules de app, transmises au processus serveur"""
+    os.environ["PROCESS_IMAGE_BACKEND"] = BACKENDS[args.backend]
+    os.environ["FAKE_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["PROCESSING_WORKERS"] = str(args.processing_workers)
+    os.environ.setdefault("EVENT_BROKER", "memory")
+    if args.mongo != "memory":
+        os.environ["MONGO_URL"] = args.mongo
+
+
+def make_page(index, size):
+    image = Image.new("RGB", size, color=(index * 37 % 255, 200, 220))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return {"filename": f"page_{index:03d}.jpg", "image_base64": base64.b64encode(buffer.getvalue()).decode("utf-8")}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.ws_messages = 0
+        self.completions = []
+
+    async def timed(self, name, coroutine):
+        start = time.perf_counter()
+        try:
+            response = await coroutine
+        except Exception:
+            self.errors[name] += 1
+            raise
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+
+class ServerProcess:
+    """loadtest.server dans un processus enfant ; le retard de boucle est relu à l'arrêt"""
+
+    def __init__(self, args):
+        self.port = args.port
+        self.lag_file = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "loadtest.server", "--port", str(args.port),
+             "--mongo", args.mongo, "--lag-file", self.lag_file],
+            env=dict(os.environ),
+        )
+
+    def wait_started(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while True:
+            if time.monotonic() > deadline or self.process.poll() is not None:
+                raise RuntimeError("Le serveur n'a pas démarré")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+
+    def stop(self):
+        """Arrête le serveur et retourne les mesures de retard de boucle"""
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        try:
+            with open(self.lag_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+        finally:
+            os.unlink(self.lag_file)
+
+
+async def listen_ws(url, recorder, stop):
+    import websockets
+    async with websockets.connect(url) as ws:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(ws.recv(), timeout=0.5)
+                recorder.ws_messages += 1
+            except asyncio.TimeoutError:
+                continue
+
+
+async def follow_batch(client, batch_id, headers, args, recorder, upload_start):
+    """Suit le batch sur son flux NDJSON jusqu'à completed, en interrogeant /result à intervalle"""
+    completed = asyncio.Event()
+
+    async def poll():
+        while not completed.is_set():
+            await recorder.timed("GET /result/{batch_id}", client.get(f"/result/{batch_id}", headers=headers))
+            try:
+                await asyncio.wait_for(completed.wait(), timeout=args.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    poller = asyncio.create_task(poll())
+    try:
+        async with client.stream("GET", f"/batch/{batch_id}/stream", headers=headers) as stream:
+            async for line in stream.aiter_lines():
+                if line and json.loads(line).get("type") == "batch":
+                    recorder.completions.append(time.perf_counter() - upload_start)
+                    break
+    except Exception:
+        recorder.errors["GET /batch/{batch_id}/stream"] += 1
+    finally:
+        completed.set()
+        await asyncio.gather(poller, return_exceptions=True)
+
+
+async def virtual_user(client, base_url, user_index, args, pages, recorder):
+    pseudo = f"load-user-{user_index}"
+    headers = {"X-User-Pseudo": pseudo}
+    stop = asyncio.Event()
+    ws_task = asyncio.create_task(listen_ws(base_url.replace("http", "ws", 1) + "/ws", recorder, stop))
+    try:
+        await recorder.timed("POST /auth/login", client.post("/auth/login", json={"pseudo": pseudo}))
+        for _ in range(args.chapters):
+            upload_start = time.perf_counter()
+            response = await recorder.timed("POST /upload-batch", client.post(
+                "/upload-batch", json={"pages": pages}, headers=headers))
+            batch_id = response.json().get("batchId")
+            if not batch_id:
+                continue
+            await follow_batch(client, batch_id, headers, args, recorder, upload_start)
+            await recorder.timed("GET /user/{pseudo}/batches", client.get(f"/user/{pseudo}/batches"))
+    finally:
+        stop.set()
+        await asyncio.gather(ws_task, return_exceptions=True)
+
+
+async def drive(base_url, args, recorder):
+    import httpx
+    pages = [make_page(i, (args.page_width, args.page_height)) for i in range(args.pages)]
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await asyncio.gather(*(virtual_user(client, base_url, i, args, pages, recorder)
+                               for i in range(args.users)))
+
+
+def report(recorder, elapsed, loop_lags):
+    result = {"elapsed_seconds": round(elapsed, 3), "ws_messages": recorder.ws_messages, "endpoints": {}}
+    for name, values in sorted(recorder.latencies.items()):
+        result["endpoints"][name] = {
+            "requests": len(values),
+            "errors": recorder.errors[name],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+        }
+    result["batch_completion"] = {
+        "batches": len(recorder.completions),
+        "p50_ms": round(percentile(recorder.completions, 50) * 1000, 1),
+        "p95_ms": round(percentile(recorder.completions, 95) * 1000, 1),
+        "p99_ms": round(percentile(recorder.completions, 99) * 1000, 1),
+    }
+    result["event_loop_lag"] = {
+        "samples": len(loop_lags),
+        "mean_ms": round(statistics.fmean(loop_lags) * 1000, 2) if loop_lags else 0.0,
+        "p99_ms": round(percentile(loop_lags, 99) * 1000, 2),
+        "max_ms": round(max(loop_lags, default=0.0) * 1000, 2),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="utilisateurs simultanés")
+    parser.add_argument("--chapters", type=int, default=1, help="chapitres uploadés par utilisateur")
+    parser.add_argument("--pages", type=int, default=5, help="pages par chapitre")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="secondes entre deux appels /result")
+    parser.add_argument("--page-width", type=int, default=800)
+    parser.add_argument("--page-height", type=int, default=1200)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="sleep")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--processing-workers", type=int, default=2)
+    parser.add_argument("--mongo", default="memory", help="'memory' ou une URL Mongo locale")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    server = ServerProcess(args)
+    recorder = Recorder()
+    try:
+        server.wait_started()
+        start = time.perf_counter()
+        try:
+            asyncio.run(drive(f"http://127.0.0.1:{args.port}", args, recorder))
+        finally:
+            elapsed = time.perf_counter() - start
+    finally:
+        loop_lags = server.stop()
+
+    result = report(recorder, elapsed, loop_lags)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""API sous charge, lancée par loadtest.run dans un processus séparé.
+
+Le générateur de charge ne partage ainsi ni le GIL ni la boucle d'événements
+du serveur mesuré. La configuration (backend, Mongo, workers) arrive par les
+variables d'environnement posées par loadtest.run.configure_environment.
+À l'arrêt (SIGINT/SIGTERM), les mesures de retard de boucle sont écrites en
+JSON dans --lag-file.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+LAG_PROBE_INTERVAL = 0.05
+
+
+async def probe_loop_lag(lags):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - LAG_PROBE_INTERVAL)
+
+
+async def serve(args, lags):
+    import uvicorn
+    from app import main as api
+
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        api.AsyncIOMotorClient = AsyncMongoMockClient
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    probe = asyncio.create_task(probe_loop_lag(lags))
+    try:
+        await server.serve()
+    finally:
+        probe.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--mongo", default="memory")
+    parser.add_argument("--lag-file", required=True)
+    args = parser.parse_args()
+
+    lags = []
+    try:
+        asyncio.run(serve(args, lags))
+    finally:
+        with open(args.lag_file, "w") as f:
+            json.dump(lags, f)
+
+
+if __name__ == "__main__":
+    main()
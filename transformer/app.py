@@ -1,12 +1,18 @@
-from flask import Flask, request, render_template_string
+from flask import Flask, request, render_template_string, send_file, url_for, jsonify
 from PIL import Image
 from io import BytesIO
-import base64
+import argparse
+import queue
 
-from herlpers.script_for_app import process_image 
+from herlpers.script_for_app import process_images
+from herlpers.inference_server import InferenceBatcher, ResultStore
 
 app = Flask(__name__)
 
+# Un seul thread d'inférence partage les modèles entre toutes les requêtes
+batcher = InferenceBatcher(process_images)
+results = ResultStore()
+
 HTML_TEMPLATE = """
 <!doctype html>
 <title>Manga Translator</title>
@@ -16,9 +22,9 @@ HTML_TEMPLATE = """
   <input type="submit" value="Translate">
 </form>
 
-{% if result_img %}
+{% if result_url %}
   <h2>Translated Result:</h2>
-  <img src="data:image/png;base64,{{ result_img }}" style="max-width:100%%; height:auto;">
+  <img src="{{ result_url }}" style="max-width:100%%; height:auto;">
 {% endif %}
 """
 
@@ -36,14 +42,45 @@ def translate_image():
         return "Empty file name", 400
 
     image = Image.open(file.stream).convert("RGB")
-    translated_img = process_image(image)
+    try:
+        future = batcher.submit(image)
+    except queue.Full:
+        return "Server busy, retry later", 503, {"Retry-After": "1"}
+    translated_img = future.result()
 
+    # Encodage PNG dans le thread de la requête, hors du thread d'inférence
     buf = BytesIO()
     translated_img.save(buf, format='PNG')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode('utf-8')
+    result_url = url_for("result_image", result_id=results.put(buf.getvalue()))
+
+    return render_template_string(HTML_TEMPLATE, result_url=result_url)
 
-    return render_template_string(HTML_TEMPLATE, result_img=img_base64)
+@app.route("/result/<result_id>.png", methods=["GET"])
+def result_image(result_id):
+    data = results.get(result_id)
+    if data is None:
+        return "Result not found or expired", 404
+    return send_file(BytesIO(data), mimetype="image/png")
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(batcher.stats())
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8, help="threads HTTP (avec waitress)")
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    if args.debug:
+        app.run(host=args.host, port=args.port, debug=True, threaded=True)
+    else:
+        try:
+            from waitress import serve
+        except ImportError:
+            # Serveur de développement multi-thread si waitress n'est pas installé
+            app.run(host=args.host, port=args.port, threaded=True)
+        else:
+            serve(app, host=args.host, port=args.port, threads=args.threads)
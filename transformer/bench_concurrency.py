@@ -0,0 +1,100 @@
+"""Benchmark de concurrence de l'application Flask de démonstration.
+
+Envoie des pages du jeu de test à /translate avec N clients simultanés, puis
+télécharge l'image résultat, et mesure latences et débit. Lancer d'abord le
+serveur (python app.py), puis par exemple :
+
+    python bench_concurrency.py --concurrency 1 4 8 --requests 32
+"""
+import argparse
+import json
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from herlpers.dataset_index import IMAGE_EXTENSIONS
+
+RESULT_URL = re.compile(r'src="(/result/[0-9a-f]+\.png)"')
+
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def translate_once(base_url, filename, data):
+    """Retourne (statut, latence en secondes) d'un envoi suivi du téléchargement du résultat"""
+    body, content_type = multipart_body("image", filename, data)
+    request = urllib.request.Request(f"{base_url}/translate", data=body, headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            html = response.read().decode("utf-8")
+        match = RESULT_URL.search(html)
+        if match is None:
+            return "no-result", time.perf_counter() - start
+        with urllib.request.urlopen(f"{base_url}{match.group(1)}") as response:
+            response.read()
+        return 200, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] if values else 0.0
+
+
+def run(base_url, pages, concurrency, total):
+    work = [pages[i % len(pages)] for i in range(total)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda page: translate_once(base_url, *page), work))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for status, latency in outcomes if status == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": dict(Counter(str(status) for status, _ in outcomes if status != 200)),
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--images", default="../data/test/images")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="requêtes par niveau de concurrence")
+    parser.add_argument("--pages", type=int, default=8, help="pages distinctes envoyées")
+    args = parser.parse_args()
+
+    names = sorted(n for n in os.listdir(args.images) if n.lower().endswith(IMAGE_EXTENSIONS))[:args.pages]
+    pages = []
+    for name in names:
+        with open(os.path.join(args.images, name), "rb") as f:
+            pages.append((name, f.read()))
+
+    for concurrency in args.concurrency:
+        report = run(args.url, pages, concurrency, args.requests)
+        with urllib.request.urlopen(f"{args.url}/stats") as response:
+            report["server"] = json.load(response)
+        print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
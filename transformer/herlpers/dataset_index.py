@@ -0,0 +1,206 @@
+"""Index compact du jeu de données (images + labels YOLO) en tableaux NumPy mappés en mémoire.
+
+Au lieu de lister le dossier et de reparser un .txt par image à chaque outil,
+l'index stocke pour chaque image son nom, ses dimensions et ses boîtes dans
+trois fichiers .npy chargés en mmap. Il est reconstruit de façon incrémentale :
+seules les images dont l'image ou le label a changé (mtime) sont relues.
+
+    index = DatasetIndex.build("data/train/images", "data/train/labels")
+    for path, image, boxes in index.iter_samples(prefetch=8):
+        ...
+"""
+import os
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+IMAGE_DTYPE = np.dtype([
+    ("name_offset", np.uint32),
+    ("name_length", np.uint16),
+    ("width", np.uint32),
+    ("height", np.uint32),
+    ("image_mtime_ns", np.int64),
+    ("label_mtime_ns", np.int64),
+    ("box_start", np.uint32),
+    ("box_count", np.uint32),
+])
+
+BOX_DTYPE = np.dtype([
+    ("cls", np.uint16),
+    ("x", np.float32),
+    ("y", np.float32),
+    ("w", np.float32),
+    ("h", np.float32),
+])
+
+
+def parse_label_file(label_path):
+    """Lignes 'cls x y w h' d'un fichier de labels YOLO"""
+    boxes = []
+    with open(label_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 5:
+                boxes.append((int(parts[0]), *map(float, parts[1:])))
+    return boxes
+
+
+class DatasetIndex:
+    def __init__(self, image_dir, images, boxes, names):
+        self.image_dir = image_dir
+        self.images = images
+        self.boxes_table = boxes
+        self.names = names
+
+    def __len__(self):
+        return len(self.images)
+
+    def name(self, i):
+        record = self.images[i]
+        start = int(record["name_offset"])
+        return bytes(self.names[start:start + int(record["name_length"])]).decode("utf-8")
+
+    def path(self, i):
+        return os.path.join(self.image_dir, self.name(i))
+
+    def size(self, i):
+        record = self.images[i]
+        return int(record["width"]), int(record["height"])
+
+    def has_label(self, i):
+        """Vrai si l'image a un fichier de labels (éventuellement vide)"""
+        return int(self.images[i]["label_mtime_ns"]) != 0
+
+    def boxes(self, i):
+        """Boîtes (x_center, y_center, w, h) normalisées de l'image i, tableau (n, 4)"""
+        record = self.images[i]
+        start = int(record["box_start"])
+        rows = self.boxes_table[start:start + int(record["box_count"])]
+        return np.stack([rows["x"], rows["y"], rows["w"], rows["h"]], axis=1) if len(rows) else np.empty((0, 4), np.float32)
+
+    def iter_samples(self, prefetch=8, mode="RGB", indices=None):
+        """Itère sur (chemin, image, boîtes) en décodant les images à l'avance dans un thread.
+
+        indices restreint l'itération à une sélection d'images (par défaut toutes).
+        """
+        indices = range(len(self)) if indices is None else indices
+        samples = queue.Queue(maxsize=max(1, prefetch))
+        done = object()
+        stop = threading.Event()
+
+        def producer():
+            try:
+                for i in indices:
+                    if stop.is_set():
+                        return
+                    path = self.path(i)
+                    image = Image.open(path).convert(mode)
+                    samples.put((path, image, self.boxes(i)))
+            except Exception as e:
+                samples.put(e)
+            finally:
+                samples.put(done)
+
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = samples.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Débloquer le producteur s'il attend une place dans la file
+            while thread.is_alive():
+                try:
+                    samples.get_nowait()
+                except queue.Empty:
+                    thread.join(timeout=0.05)
+
+    @classmethod
+    def load(cls, image_dir, index_dir=None):
+        index_dir = index_dir or os.path.join(os.path.dirname(os.path.abspath(image_dir)), ".index")
+        return cls(
+            image_dir,
+            np.load(os.path.join(index_dir, "images.npy"), mmap_mode="r"),
+            np.load(os.path.join(index_dir, "boxes.npy"), mmap_mode="r"),
+            np.load(os.path.join(index_dir, "names.npy"), mmap_mode="r"),
+        )
+
+    @classmethod
+    def build(cls, image_dir, label_dir, index_dir=None):
+        """Construit ou met à jour l'index puis le retourne mappé en mémoire"""
+        index_dir = index_dir or os.path.join(os.path.dirname(os.path.abspath(image_dir)), ".index")
+        previous = {}
+        try:
+            old = cls.load(image_dir, index_dir)
+            previous = {old.name(i): i for i in range(len(old))}
+        except (FileNotFoundError, ValueError):
+            old = None
+
+        entries = sorted(
+            (entry for entry in os.scandir(image_dir)
+             if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)),
+            key=lambda entry: entry.name,
+        )
+
+        images = np.zeros(len(entries), dtype=IMAGE_DTYPE)
+        box_rows = []
+        name_bytes = bytearray()
+        changed = old is None or len(previous) != len(entries)
+
+        for i, entry in enumerate(entries):
+            label_path = os.path.join(label_dir, os.path.splitext(entry.name)[0] + ".txt")
+            try:
+                label_mtime = os.stat(label_path).st_mtime_ns
+            except FileNotFoundError:
+                label_mtime = 0
+            image_mtime = entry.stat().st_mtime_ns
+            encoded = entry.name.encode("utf-8")
+
+            record = images[i]
+            record["name_offset"] = len(name_bytes)
+            record["name_length"] = len(encoded)
+            record["image_mtime_ns"] = image_mtime
+            record["label_mtime_ns"] = label_mtime
+            record["box_start"] = len(box_rows)
+            name_bytes.extend(encoded)
+
+            j = previous.get(entry.name)
+            if j is not None and old.images[j]["image_mtime_ns"] == image_mtime \
+                    and old.images[j]["label_mtime_ns"] == label_mtime:
+                # Inchangé : dimensions et boîtes reprises de l'ancien index
+                record["width"], record["height"] = old.size(j)
+                start = int(old.images[j]["box_start"])
+                rows = old.boxes_table[start:start + int(old.images[j]["box_count"])]
+                box_rows.extend(rows.tolist())
+                record["box_count"] = len(rows)
+                continue
+
+            changed = True
+            with Image.open(entry.path) as image:
+                record["width"], record["height"] = image.size
+            boxes = parse_label_file(label_path) if label_mtime else []
+            box_rows.extend(boxes)
+            record["box_count"] = len(boxes)
+
+        if changed:
+            os.makedirs(index_dir, exist_ok=True)
+            arrays = {
+                "images": images,
+                "boxes": np.array(box_rows, dtype=BOX_DTYPE),
+                "names": np.frombuffer(bytes(name_bytes), dtype=np.uint8),
+            }
+            # Chaque fichier est remplacé atomiquement (écriture dans un .tmp puis rename)
+            for name, array in arrays.items():
+                tmp_path = os.path.join(index_dir, f"{name}.tmp.npy")
+                np.save(tmp_path, array)
+                os.replace(tmp_path, os.path.join(index_dir, f"{name}.npy"))
+        return cls.load(image_dir, index_dir)
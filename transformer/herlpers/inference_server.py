@@ -0,0 +1,102 @@
+"""Service d'inférence partagé par les threads de l'application Flask.
+
+Un seul thread possède les modèles (YOLO, Marian) : les requêtes concurrentes
+déposent leur image dans une file bornée et attendent leur résultat. Le thread
+d'inférence regroupe les requêtes arrivées dans une courte fenêtre en un seul
+appel de détection et de traduction (micro-batching).
+
+Variables d'environnement :
+    INFERENCE_MAX_BATCH     images par appel groupé (défaut 4)
+    INFERENCE_MAX_WAIT_MS   attente maximale pour compléter un lot (défaut 20)
+    INFERENCE_QUEUE_SIZE    requêtes en attente avant refus (défaut 32)
+    RESULT_STORE_SIZE       images traduites gardées en mémoire (défaut 64)
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "4"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "32"))
+RESULT_STORE_SIZE = int(os.getenv("RESULT_STORE_SIZE", "64"))
+
+
+class InferenceBatcher:
+    def __init__(self, process_images, max_batch=INFERENCE_MAX_BATCH,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, queue_size=INFERENCE_QUEUE_SIZE):
+        self.process_images = process_images
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue(maxsize=queue_size)
+        self.batches = 0
+        self.images = 0
+        self._thread = threading.Thread(target=self._run, name="inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        """Retourne un Future de l'image traduite ; lève queue.Full si le service est saturé"""
+        future = Future()
+        self.requests.put_nowait((image, future))
+        return future
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = [image for image, _ in batch]
+            try:
+                results = self.process_images(images)
+            except Exception as e:
+                print(f"Erreur lors du traitement du lot : {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": self.images / self.batches if self.batches else 0,
+            "queued": self.requests.qsize(),
+        }
+
+
+class ResultStore:
+    """Dernières images traduites (PNG) servies par URL, en nombre borné"""
+
+    def __init__(self, max_items=RESULT_STORE_SIZE):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data):
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._items[result_id] = data
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return result_id
+
+    def get(self, result_id):
+        with self._lock:
+            return self._items.get(result_id)
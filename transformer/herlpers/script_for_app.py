@@ -8,7 +8,8 @@ import ultralytics.nn.tasks
 from ultralytics.nn.tasks import DetectionModel
 # Correction : retirer C3k de l'import (il n'existe pas dans ultralytics.nn.modules.block)
 from ultralytics.nn.modules.block import C3k2
-from herlpers.extract_and_translate import extract_and_translate
+from herlpers.extract_and_translate import extract_and_translate, clean_text, yolo_to_pixel
+from herlpers import extract_and_translate as translation
 from herlpers.draw import draw_translations
 
 # Charger le modèle de manière dynamique
@@ -91,3 +92,39 @@ def process_image(input_image: Image.Image) -> Image.Image:
     except Exception as e:
         print(f"Error processing image: {e}")
         return input_image
+
+
+def translate_batch(texts):
+    """Traduit en un seul appel generate() les textes de plusieurs pages"""
+    if not texts:
+        return []
+    inputs = translation.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+    output = translation.model.generate(**inputs)
+    return translation.tokenizer.batch_decode(output, skip_special_tokens=True)
+
+def process_images(input_images):
+    """Version groupée de process_image : une détection YOLO et une traduction pour toutes les images"""
+    if model is None:
+        print("Model not available, returning original images")
+        return input_images
+
+    try:
+        results_list = model(input_images, verbose=False)
+        regions = []  # (index image, boîte pixel, texte OCR)
+        for index, (image, results) in enumerate(zip(input_images, results_list)):
+            width, height = image.size
+            for box in yolo_prediction_to_yolo_format(results, image.size):
+                pixel_box = yolo_to_pixel(box, width, height)
+                if pixel_box is not None:
+                    regions.append((index, pixel_box, clean_text(image.crop(pixel_box))))
+
+        translated = iter(translate_batch([text for _, _, text in regions if text]))
+        translations = [[] for _ in input_images]
+        for index, pixel_box, text in regions:
+            translations[index].append((pixel_box, next(translated) if text else ""))
+
+        return [draw_translations(image, page_translations)
+                for image, page_translations in zip(input_images, translations)]
+    except Exception as e:
+        print(f"Error processing images: {e}")
+        return input_images
@@ -1,6 +1,7 @@
 from PIL import Image
 from herlpers.extract_and_translate import extract_and_translate
 from herlpers.draw import draw_translations
+from herlpers.dataset_index import DatasetIndex
 from tqdm import tqdm
 import os
 
@@ -10,26 +11,16 @@ label_dir = "scantrad/data/train/labels"
 output_dir = "scantrad/data/train/translated_images"
 os.makedirs(output_dir, exist_ok=True)
 
-image_files = [f for f in os.listdir(image_dir) if f.endswith(".jpg")]
+# Index mappé en mémoire : seuls les fichiers modifiés depuis le dernier lancement sont relus
+index = DatasetIndex.build(image_dir, label_dir)
+# Comme avant l'index : seulement les .jpg qui ont un fichier de labels
+selected = [i for i in range(len(index)) if index.name(i).endswith(".jpg") and index.has_label(i)]
 
 # =========================================== TRANSLATING IMAGES
-for image_file in tqdm(image_files, desc="Translating images"):
-    image_path = os.path.join(image_dir, image_file)
-    label_file = os.path.splitext(image_file)[0] + ".txt"
-    label_path = os.path.join(label_dir, label_file)
-
-    if not os.path.exists(image_path) or not os.path.exists(label_path):
-        continue
-
-    image = Image.open(image_path).convert("RGB")
-
-    yolo_boxes = []
-    with open(label_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) == 5:
-                _, x, y, w, h = map(float, parts)
-                yolo_boxes.append((x, y, w, h))
+for image_path, image, boxes in tqdm(index.iter_samples(prefetch=8, indices=selected),
+                                     total=len(selected), desc="Translating images"):
+    image_file = os.path.basename(image_path)
+    yolo_boxes = [tuple(box) for box in boxes.tolist()]
 
     translations = extract_and_translate(image, yolo_boxes)
     translated_img = draw_translations(image, translations)